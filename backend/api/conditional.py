@@ -0,0 +1,112 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from recipes.models import DataVersion, Follow, Recipe
+from recipes.versions import INGREDIENTS, TAGS, get_version
+
+CACHEABLE_STATUSES = (200, 304)
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+AUTHOR_FIELDS = ('author__email', 'author__username', 'author__first_name',
+                 'author__last_name')
+VERSION_FIELDS = ('tags_version', 'ingredients_version')
+FLAG_FIELDS = ('is_favorited', 'is_in_shopping_cart', 'is_subscribed')
+
+
+def data_version(request, name):
+    if not hasattr(request, '_data_versions'):
+        request._data_versions = {}
+    if name not in request._data_versions:
+        request._data_versions[name] = get_version(name)
+    return request._data_versions[name]
+
+
+def version_etag(name):
+    def etag(request, *args, **kwargs):
+        version = data_version(request, name)
+        return f'{name}-{version.version if version else 0}'
+    return etag
+
+
+def version_last_modified(name):
+    def last_modified(request, *args, **kwargs):
+        version = data_version(request, name)
+        return version.updated if version else None
+    return last_modified
+
+
+def data_version_subquery(name):
+    return Subquery(DataVersion.objects.filter(name=name).values('version'))
+
+
+def recipe_state(request, pk):
+    """Всё, от чего зависит ответ с рецептом, одним запросом.
+
+    Рецепт целиком видят только авторизованные (RecipePermissions),
+    поэтому для анонимов валидаторов нет: иначе совпавший If-None-Match
+    дал бы 304 в обход проверки прав.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    if not hasattr(request, '_recipe_state'):
+        request._recipe_state = Recipe.objects.with_user_flags(user).filter(
+            pk=pk
+        ).annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+            tags_version=data_version_subquery(TAGS),
+            ingredients_version=data_version_subquery(INGREDIENTS),
+        ).values(
+            'updated', *AUTHOR_FIELDS, *VERSION_FIELDS, *FLAG_FIELDS
+        ).first()
+    return request._recipe_state
+
+
+def recipe_etag(request, pk=None, *args, **kwargs):
+    state = recipe_state(request, pk)
+    if state is None:
+        return None
+    author = hashlib.md5(
+        '\0'.join(state[field] for field in AUTHOR_FIELDS).encode()
+    ).hexdigest()[:12]
+    versions = '-'.join(
+        str(state[field] or 0) for field in VERSION_FIELDS)
+    flags = ''.join(str(int(state[field])) for field in FLAG_FIELDS)
+    return (f'recipe-{pk}-{state["updated"].timestamp()}-{versions}-'
+            f'{author}-{flags}')
+
+
+def patch_read_cache_headers(request, response):
+    """Cache-Control только для успешных ответов: ошибки не кешируются."""
+    if response.status_code not in CACHEABLE_STATUSES:
+        for header in VALIDATOR_HEADERS:
+            if response.has_header(header):
+                del response[header]
+        return
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.ANONYMOUS_CACHE_MAX_AGE)
+    patch_vary_headers(response, ('Authorization',))
+
+
+class CacheControlMixin:
+    """Добавляет Cache-Control к ответам на GET-запросы.
+
+    Анонимные ответы может кешировать nginx, авторизованные клиент
+    обязан перепроверять по ETag.
+    """
+
+    cache_control_actions = ('list', 'retrieve')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if (request.method in ('GET', 'HEAD')
+                and self.action in self.cache_control_actions):
+            patch_read_cache_headers(request, response)
+        return response
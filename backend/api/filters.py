@@ -1,10 +1,18 @@
 import django_filters
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+
+
+class TagMaskFilter(django_filters.ModelMultipleChoiceFilter):
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.with_any_tag([tag.id for tag in value])
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
+    tags = TagMaskFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
@@ -18,6 +26,9 @@ class RecipeFilter(django_filters.FilterSet):
     author = django_filters.NumberFilter(
         method='filter_author'
     )
+    search = django_filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Recipe
@@ -41,6 +52,11 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.filter(author=value)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
 
 class IngredientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
@@ -0,0 +1,65 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный по названию индекс ингредиентов в памяти процесса.
+
+    Пересобирается лениво после invalidate() или по истечении
+    INGREDIENT_INDEX_TTL, чтобы подхватывать изменения из других воркеров.
+    """
+
+    def __init__(self):
+        self._keys = None
+        self._entries = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._keys = None
+
+    def _is_stale(self):
+        return (self._keys is None or time.monotonic() - self._built_at
+                > settings.INGREDIENT_INDEX_TTL)
+
+    def _build(self):
+        rows = sorted(
+            (name.casefold(), pk, name, unit)
+            for pk, name, unit in Ingredient.objects.order_by().values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        self._entries = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in rows
+        ]
+        self._keys = [row[0] for row in rows]
+        self._built_at = time.monotonic()
+
+    def search(self, query, limit):
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._build()
+        keys, entries = self._keys, self._entries
+        query = query.strip().casefold()
+        result = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(query)):
+            result.append(entries[position])
+            position += 1
+        if len(result) < limit:
+            for key, entry in zip(keys, entries):
+                if query in key and not key.startswith(query):
+                    result.append(entry)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
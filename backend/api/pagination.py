@@ -1,6 +1,151 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from datetime import datetime
 
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+DATETIME_FIELDS = {'created'}
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_cursor_value(field, value):
+    """Значение курсора нужного типа; ValueError, если оно подделано."""
+    if field.lstrip('-') in DATETIME_FIELDS:
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+        if parsed is None or timezone.is_naive(parsed):
+            raise ValueError(value)
+        return parsed
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    parsed = int(value)
+    if not 0 < parsed <= MAX_ID:
+        raise ValueError(value)
+    return parsed
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу последней записи без COUNT и OFFSET."""
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering, page_size):
+        self.ordering = ordering
+        self.page_size = page_size
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                parse_cursor_value(field, value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def after_cursor(self, values):
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(
+                self.after_cursor(self.decode_cursor(cursor)))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class KeysetModePagination(PageNumberPagination):
+    """Переключается на KeysetPagination, если в запросе есть ?cursor.
+
+    Курсор задаёт свой порядок, поэтому параметры из keyset_conflicts,
+    меняющие порядок выдачи, вместе с ним не принимаются.
+    """
 
-class FollowPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
+    keyset_ordering = ()
+    keyset_conflicts = ()
+    conflict_message = 'Курсор нельзя сочетать с параметром {}.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            for param in self.keyset_conflicts:
+                if request.query_params.get(param):
+                    raise ValidationError({
+                        KeysetPagination.cursor_query_param:
+                            self.conflict_message.format(param)
+                    })
+            self.keyset = KeysetPagination(
+                self.keyset_ordering, self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(KeysetModePagination):
+    keyset_ordering = ('-created', '-id')
+    keyset_conflicts = (api_settings.ORDERING_PARAM, 'search')
+
+
+class FollowPagination(KeysetModePagination):
+    keyset_ordering = ('-follow_id',)
@@ -27,12 +27,11 @@ class RecipePermissions(permissions.BasePermission):
         user = request.user
         if request.method == 'GET':
             return True
-        elif request.method in ['GET', 'POST']:
-            return user.is_authenticated
+        return user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
         user = request.user
-        if request.method in ['PUT', 'DELETE']:
+        if request.method in ['PUT', 'PATCH', 'DELETE']:
             return obj.author == user
         if request.method == 'GET':
             return request.user.is_authenticated
@@ -1,13 +1,20 @@
-import base64
 import re
 
-from django.core.files.base import ContentFile
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
-from api.utils import bulk_create_recipe_ingredients, bulk_create_recipe_tags
+from api.shopping_list import schedule_recipe_invalidation
+from api.utils import (bulk_create_recipe_ingredients, bulk_create_recipe_tags,
+                       resolve_ids, update_recipe_ingredients,
+                       update_recipe_tags)
+from foodgram.metrics import TimedSerializerMixin
+from recipes.images import (decode_base64_image, schedule_release,
+                            schedule_variants)
 from recipes.models import (Cart, CustomUser, Ingredient, Recipe,
                             RecipeIngredient, Tag)
+from recipes.search import update_search_index
 
 MAX_VALUE = 32000
 MIN_VALUE = 1
@@ -58,7 +65,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         return False
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
 
@@ -74,6 +81,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             user = request.user
@@ -81,7 +90,7 @@ class CustomUserSerializer(UserSerializer):
         return False
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.IntegerField(required=True)
 
     class Meta:
@@ -89,7 +98,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = (
@@ -100,8 +109,8 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientM2MSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
+    id = serializers.IntegerField(
+        min_value=MIN_VALUE,
         required=True
     )
     amount = serializers.IntegerField(
@@ -120,9 +129,10 @@ class IngredientM2MSerializer(serializers.ModelSerializer):
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            try:
+                return decode_base64_image(data)
+            except DjangoValidationError as error:
+                raise serializers.ValidationError(error.messages)
 
         return super().to_internal_value(data)
 
@@ -131,9 +141,8 @@ class RecipeCrUpSerializer(serializers.ModelSerializer):
     ingredients = IngredientM2MSerializer(
         many=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_VALUE)
     )
     image = Base64ImageField(required=False, allow_null=True)
     is_favorited = serializers.SerializerMethodField(
@@ -171,6 +180,17 @@ class RecipeCrUpSerializer(serializers.ModelSerializer):
         user = request.user
         return user.user_cart.filter(item=obj).exists()
 
+    def validate_ingredients(self, value):
+        ingredients = resolve_ids(
+            Ingredient, [item['id'] for item in value], 'Ингредиенты')
+        for item in value:
+            item['id'] = ingredients[item['id']]
+        return value
+
+    def validate_tags(self, value):
+        tags = resolve_ids(Tag, value, 'Теги')
+        return [tags[tag_id] for tag_id in value]
+
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -178,29 +198,50 @@ class RecipeCrUpSerializer(serializers.ModelSerializer):
 
         bulk_create_recipe_ingredients(recipe, ingredients)
         bulk_create_recipe_tags(recipe, tags)
+        update_search_index([recipe.id])
+        schedule_variants(recipe)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        recipe = instance
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-
-        recipe.recipe_recipeingredients.all().delete()
-        bulk_create_recipe_ingredients(recipe, ingredients)
-        recipe.recipe_recipetags.all().delete()
-        bulk_create_recipe_tags(recipe, tags)
-
-        instance.image = validated_data.get('image', instance.image)
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time)
-        instance.save()
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        old_image = instance.image.name
+        if not validated_data.get('image'):
+            validated_data.pop('image', None)
+
+        changed_fields = []
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                changed_fields.append(field)
+        if 'image' in changed_fields:
+            instance.image_thumbnail = instance.image_feed = ''
+            changed_fields += ['image_thumbnail', 'image_feed']
+
+        ingredients_changed = (
+            ingredients is not None
+            and update_recipe_ingredients(instance, ingredients))
+        tags_changed = (
+            tags is not None and update_recipe_tags(instance, tags))
+        if ingredients_changed:
+            schedule_recipe_invalidation([instance.id])
+
+        if changed_fields or ingredients_changed or tags_changed:
+            instance.save(update_fields=changed_fields + ['updated'])
+        if ingredients_changed or {'name', 'text'} & set(changed_fields):
+            update_search_index([instance.id])
+        if instance.image.name != old_image:
+            schedule_variants(instance)
+            schedule_release([old_image])
         return instance
 
     def to_representation(self, instance):
-        recipe_serializer = RecipeReadSerializer(instance)
+        request = self.context.get('request')
+        instance = Recipe.objects.for_read(request.user).get(pk=instance.pk)
+        recipe_serializer = RecipeReadSerializer(
+            instance, context=self.context)
         return recipe_serializer.data
 
 
@@ -228,7 +269,7 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     ingredients = RecipeIngredientReadSerializer(
         many=True,
         source='recipe_recipeingredients',
@@ -243,6 +284,10 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     image = serializers.ReadOnlyField(
         source='image.url')
+    image_thumbnail = serializers.SerializerMethodField(
+        method_name='get_image_thumbnail')
+    image_feed = serializers.SerializerMethodField(
+        method_name='get_image_feed')
     is_favorited = serializers.SerializerMethodField(
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -254,6 +299,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'id',
             'tags',
             'image',
+            'image_thumbnail',
+            'image_feed',
             'author',
             'ingredients',
             'is_favorited',
@@ -263,7 +310,15 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'cooking_time'
         )
 
+    def get_image_thumbnail(self, obj):
+        return (obj.image_thumbnail or obj.image).url
+
+    def get_image_feed(self, obj):
+        return (obj.image_feed or obj.image).url
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             user = request.user
@@ -271,6 +326,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             user = request.user
@@ -284,7 +341,8 @@ class ShopSerializer(serializers.ModelSerializer):
         fields = ('user', 'item')
 
 
-class FavoriteCartSerializer(serializers.ModelSerializer):
+class FavoriteCartSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
     name = serializers.CharField(required=False)
     image = serializers.ImageField(required=False)
     cooking_time = serializers.ReadOnlyField()
@@ -294,10 +352,13 @@ class FavoriteCartSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class SubscriptionsParamsSerializer(serializers.Serializer):
+    recipes_limit = serializers.IntegerField(min_value=0, required=False)
+
+
+class FollowSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
-    recipes_count = serializers.SerializerMethodField(
-        method_name='get_recipes_count')
+    recipes_count = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
 
@@ -314,22 +375,18 @@ class FollowSerializer(serializers.ModelSerializer):
             'recipes_count')
 
     def get_recipes(self, obj):
-        limit = self.context.get('limit')
-        if limit:
-            recipes = obj.author_recipes.all()[:int(limit)]
-            return FavoriteCartSerializer(
-                recipes, many=True, read_only=True).data
-        recipes = obj.author_recipes.all()
+        recipes = getattr(obj, 'subscription_recipes', None)
+        if recipes is None:
+            recipes = obj.author_recipes.order_by('-created', '-id')
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return FavoriteCartSerializer(
             recipes, many=True, read_only=True).data
 
-    def get_recipes_count(self, obj):
-        request = self.context.get('request')
-        if request:
-            return obj.author_recipes.all().count()
-        return False
-
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             user = request.user
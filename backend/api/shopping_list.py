@@ -0,0 +1,198 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from recipes.models import Cart, RecipeIngredient
+
+FONT_NAME = 'Arial'
+FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'Arial.ttf')
+FILENAME = 'shop_list'
+CACHE_KEY = 'shopping_list:{}'
+SIZE_FONTS = 12
+X_POINT = 50
+Y_POINT = 750
+MIN_Y_POINT = 50
+DECREASE_Y_POINT = 20
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Формат файла списка покупок.
+
+    Сам файл отдаётся готовым ответом и через рендерер не проходит,
+    поэтому сюда попадают только ошибки — они отдаются в JSON.
+    """
+
+    json_renderer = JSONRenderer()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = self.json_renderer.media_type
+        return self.json_renderer.render(
+            data, self.json_renderer.media_type, renderer_context)
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class TXTRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+RENDERER_CLASSES = [JSONRenderer, PDFRenderer, TXTRenderer, CSVRenderer]
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def register_fonts():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def get_shopping_list(user):
+    key = CACHE_KEY.format(user.id)
+    ingredients = cache.get(key)
+    if ingredients is None:
+        ingredients = calculate_shopping_list(user)
+        cache.set(key, ingredients, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return ingredients
+
+
+def calculate_shopping_list(user):
+    ingredients = RecipeIngredient.objects.filter(
+        recipe__item_cart__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit').annotate(
+            amount=Sum('amount')).order_by('ingredient__name')
+    return [
+        {
+            'name': ingredient['ingredient__name'],
+            'unit': ingredient['ingredient__measurement_unit'],
+            'amount': int(ingredient['amount'] or 0)
+        }
+        for ingredient in ingredients
+    ]
+
+
+def invalidate_shopping_lists(user_ids):
+    cache.delete_many([CACHE_KEY.format(user_id) for user_id in user_ids])
+
+
+def invalidate_recipe_shopping_lists(recipe_ids):
+    invalidate_shopping_lists(
+        Cart.objects.filter(item__in=recipe_ids).order_by().values_list(
+            'user_id', flat=True).distinct())
+
+
+class RecipeInvalidation:
+    """Рецепты транзакции, чьи списки покупок сбросятся после коммита."""
+
+    def __init__(self):
+        self.recipe_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        invalidate_recipe_shopping_lists(list(self.recipe_ids))
+
+
+def pending_invalidation(connection):
+    for entry in connection.run_on_commit:
+        callback = entry[1]
+        if isinstance(callback, RecipeInvalidation) and not callback.done:
+            return callback
+    return None
+
+
+def schedule_recipe_invalidation(recipe_ids):
+    """Сбрасывает списки покупок с этими рецептами после коммита.
+
+    На транзакцию регистрируется один обработчик on_commit, и корзины
+    запрашиваются один раз, сколько бы строк ни изменилось. При откате
+    обработчик отбрасывается вместе с накопленными рецептами.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        invalidate_recipe_shopping_lists(list(recipe_ids))
+        return
+    batch = pending_invalidation(connection)
+    if batch is None:
+        batch = RecipeInvalidation()
+        transaction.on_commit(batch)
+    batch.recipe_ids.update(recipe_ids)
+
+
+def ingredient_line(ingredient):
+    return (f'{ingredient["name"]}'
+            f'({ingredient["unit"]}) — '
+            f'{ingredient["amount"]}')
+
+
+def render_pdf(ingredients):
+    buffer = io.BytesIO()
+    file_pdf = Canvas(buffer)
+    file_pdf.setFont(FONT_NAME, SIZE_FONTS)
+    y_coordinate = Y_POINT
+    for ingredient in ingredients:
+        if y_coordinate < MIN_Y_POINT:
+            file_pdf.showPage()
+            file_pdf.setFont(FONT_NAME, SIZE_FONTS)
+            y_coordinate = Y_POINT
+        file_pdf.drawString(X_POINT, y_coordinate, ingredient_line(ingredient))
+        y_coordinate -= DECREASE_Y_POINT
+    file_pdf.showPage()
+    file_pdf.save()
+    buffer.seek(0)
+    return buffer
+
+
+def iter_txt(ingredients):
+    for ingredient in ingredients:
+        yield ingredient_line(ingredient) + '\n'
+
+
+def iter_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow(
+            (ingredient['name'], ingredient['unit'], ingredient['amount']))
+
+
+def shopping_list_response(ingredients, file_format):
+    if file_format == TXTRenderer.format:
+        response = StreamingHttpResponse(
+            iter_txt(ingredients), content_type='text/plain; charset=utf-8')
+    elif file_format == CSVRenderer.format:
+        response = StreamingHttpResponse(
+            iter_csv(ingredients), content_type='text/csv; charset=utf-8')
+    else:
+        return FileResponse(
+            render_pdf(ingredients),
+            as_attachment=True,
+            filename=f'{FILENAME}.pdf',
+            content_type='application/pdf'
+        )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME}.{file_format}"')
+    return response
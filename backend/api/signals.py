@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.ingredient_index import ingredient_index
+from api.shopping_list import (invalidate_recipe_shopping_lists,
+                               invalidate_shopping_lists,
+                               schedule_recipe_invalidation)
+from recipes.models import Cart, Ingredient, RecipeIngredient
+
+
+@receiver([post_save, post_delete], sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_shopping_lists([user_id]))
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    schedule_recipe_invalidation([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        recipe_ids = RecipeIngredient.objects.filter(
+            ingredient=instance.pk).values('recipe_id')
+        transaction.on_commit(
+            lambda: invalidate_recipe_shopping_lists(recipe_ids))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_index_changed(sender, **kwargs):
+    ingredient_index.invalidate()
@@ -0,0 +1,92 @@
+from rest_framework.test import APITestCase
+
+from recipes.models import CustomUser, Ingredient, Recipe, Tag
+from recipes.seed import ensure_ingredients, ensure_tags
+
+
+class RecipeCacheHeadersTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipe.png')
+        cls.url = f'/api/recipes/{cls.recipe.id}/'
+
+    def test_anonymous_list_is_public(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_errors_are_not_cacheable(self):
+        anonymous = self.client.get(self.url)
+        self.assertEqual(anonymous.status_code, 401)
+        self.assertFalse(anonymous.has_header('Cache-Control'))
+        self.client.force_authenticate(self.author)
+        missing = self.client.get(f'/api/recipes/{self.recipe.id + 1}/')
+        self.assertEqual(missing.status_code, 404)
+        self.assertFalse(missing.has_header('Cache-Control'))
+
+    def test_authenticated_detail_is_private(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_etag_revalidation(self):
+        self.client.force_authenticate(self.author)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.patch(
+            self.url, {'cooking_time': 20}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['cooking_time'], 20)
+
+    def test_anonymous_gets_no_validators(self):
+        self.client.force_authenticate(self.author)
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_etag_follows_related_changes(self):
+        tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                 slug='breakfast')
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+        self.client.force_authenticate(self.author)
+        changes = {
+            'tag': lambda: Tag.objects.filter(pk=tag.pk).first().save(),
+            'ingredient': lambda: Ingredient.objects.filter(
+                pk=ingredient.pk).first().save(),
+            'author': lambda: self.client.patch(
+                '/api/users/me/', {'first_name': 'Новое имя'},
+                format='json'),
+        }
+        for name, change in changes.items():
+            with self.subTest(change=name):
+                etag = self.client.get(self.url)['ETag']
+                change()
+                response = self.client.get(
+                    self.url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+class SeedVersionTests(APITestCase):
+    def test_seeding_changes_etags(self):
+        for url, seed in (('/api/tags/', ensure_tags),
+                          ('/api/ingredients/', ensure_ingredients)):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                seed()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,60 @@
+from rest_framework.test import APITestCase
+
+from api.utils import bulk_create_recipe_tags
+from recipes.models import MAX_TAG_ID, CustomUser, Recipe, Tag
+
+RECIPES_URL = '/api/recipes/'
+
+
+class TagFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        cls.breakfast = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.lunch = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch')
+        cls.late = Tag.objects.create(
+            id=MAX_TAG_ID + 1, name='Поздний ужин', color='#8775D2',
+            slug='late')
+        cls.recipes = {}
+        for name, tags in (('breakfast', [cls.breakfast]),
+                           ('both', [cls.breakfast, cls.lunch]),
+                           ('late', [cls.late]),
+                           ('untagged', [])):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=name, text='Текст',
+                cooking_time=10, image='recipe.png')
+            bulk_create_recipe_tags(recipe, tags)
+            cls.recipes[name] = recipe.id
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def names(self, *slugs):
+        response = self.client.get(RECIPES_URL, {'tags': slugs, 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return {recipe['name'] for recipe in response.data['results']}
+
+    def test_any_of_tags(self):
+        self.assertEqual(self.names('breakfast'), {'breakfast', 'both'})
+        self.assertEqual(self.names('lunch'), {'both'})
+        self.assertEqual(
+            self.names('breakfast', 'lunch'), {'breakfast', 'both'})
+
+    def test_tag_above_mask_falls_back_to_join(self):
+        self.assertEqual(self.names('late'), {'late'})
+        self.assertEqual(self.names('lunch', 'late'), {'both', 'late'})
+
+    def test_unknown_slug_is_rejected(self):
+        response = self.client.get(RECIPES_URL, {'tags': 'brunch'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_mask_follows_tag_update(self):
+        url = f'{RECIPES_URL}{self.recipes["breakfast"]}/'
+        response = self.client.patch(
+            url, {'tags': [self.lunch.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names('breakfast'), {'both'})
+        self.assertEqual(self.names('lunch'), {'breakfast', 'both'})
@@ -0,0 +1,96 @@
+import json
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from recipes.models import CustomUser, Ingredient, Recipe, Tag
+
+IMPORT_URL = '/api/recipes/import/'
+MEDIA_ROOT = tempfile.mkdtemp()
+OWN_IMAGE = f'recipes/{"a" * 64}.png'
+OTHER_IMAGE = f'recipes/{"b" * 64}.png'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            email='user@foodgram.local', username='user')
+        cls.other = CustomUser.objects.create(
+            email='other@foodgram.local', username='other')
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        for author, image in ((cls.user, OWN_IMAGE),
+                              (cls.other, OTHER_IMAGE)):
+            Recipe.objects.create(
+                author=author, name='Рецепт', text='Текст', cooking_time=10,
+                image=image)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(MEDIA_ROOT=MEDIA_ROOT):
+            for name in (OWN_IMAGE, OTHER_IMAGE):
+                default_storage.save(name, ContentFile(b'image'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def post(self, *images):
+        lines = [
+            json.dumps({
+                'author': self.user.email, 'name': 'Импорт',
+                'text': 'Текст', 'cooking_time': 5, 'image': image,
+                'tags': ['breakfast'],
+                'ingredients': [{'name': 'соль', 'measurement_unit': 'г',
+                                 'amount': 1}],
+            })
+            for image in images
+        ]
+        return self.client.generic(
+            'POST', IMPORT_URL, '\n'.join(lines).encode(),
+            content_type='application/x-ndjson')
+
+    def report(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in response.content.splitlines()]
+
+    def test_own_image_is_imported(self):
+        report = self.report(self.post(OWN_IMAGE))
+        self.assertEqual(report[-1], {
+            'done': True, 'processed': 1, 'created': 1, 'failed': 0})
+        self.assertEqual(
+            Recipe.objects.filter(author=self.user, name='Импорт').count(), 1)
+
+    def test_foreign_and_unsafe_images_are_rejected(self):
+        report = self.report(self.post(OTHER_IMAGE, '../etc/passwd'))
+        self.assertEqual([error['line'] for error in report[0]['errors']],
+                         [1, 2])
+        self.assertEqual(report[-1]['failed'], 2)
+        self.assertFalse(Recipe.objects.filter(name='Импорт').exists())
+
+    def test_staff_gets_path_errors_instead_of_crash(self):
+        self.user.is_staff = True
+        report = self.report(self.post('../etc/passwd', OTHER_IMAGE))
+        errors = report[0]['errors']
+        self.assertEqual([error['line'] for error in errors], [1])
+        self.assertIn('недопустимый путь', errors[0]['errors'][0])
+        self.assertEqual(report[-1]['created'], 1)
+
+    def test_empty_body_is_rejected(self):
+        response = self.client.generic(
+            'POST', IMPORT_URL, b'', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.generic(
+            'POST', IMPORT_URL, b'\n\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
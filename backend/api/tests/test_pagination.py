@@ -0,0 +1,94 @@
+import base64
+import json
+
+from rest_framework.test import APITestCase
+
+from recipes.models import CustomUser, Follow, Recipe
+
+RECIPES_URL = '/api/recipes/'
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+FEED_URL = '/api/recipes/feed/'
+
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            email='user@foodgram.local', username='user')
+        cls.authors = [
+            CustomUser.objects.create(
+                email=f'author{number}@foodgram.local',
+                username=f'author{number}')
+            for number in range(3)
+        ]
+        for number in range(5):
+            Recipe.objects.create(
+                author=cls.authors[0], name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipe.png')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_recipes_cursor_round_trip(self):
+        expected = list(Recipe.objects.order_by(
+            '-created', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk(f'{RECIPES_URL}?cursor=&limit=2'),
+                         expected)
+
+    def test_feed_cursor_round_trip(self):
+        expected = list(Recipe.objects.order_by(
+            '-created', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk(f'{FEED_URL}?limit=2'), expected)
+
+    def test_subscriptions_cursor_round_trip(self):
+        expected = [author.id for author in reversed(self.authors)]
+        self.assertEqual(
+            self.walk(f'{SUBSCRIPTIONS_URL}?cursor=&limit=1'), expected)
+
+    def test_invalid_cursors_return_404(self):
+        invalid = [
+            'not base64!',
+            cursor({'created': 1}),
+            cursor(['x', 1]),
+            cursor(['2024-01-01T00:00:00', 1]),
+            cursor(['2024-01-01T00:00:00+00:00', 'x']),
+            cursor(['2024-01-01T00:00:00+00:00', True]),
+            cursor(['2024-01-01T00:00:00+00:00', 2 ** 70]),
+            cursor(['2024-01-01T00:00:00+00:00']),
+        ]
+        for url in (RECIPES_URL, FEED_URL):
+            for value in invalid:
+                with self.subTest(url=url, cursor=value):
+                    response = self.client.get(url, {'cursor': value})
+                    self.assertEqual(response.status_code, 404)
+        for value in (cursor(['x']), cursor([None]), cursor([1, 2])):
+            with self.subTest(url=SUBSCRIPTIONS_URL, cursor=value):
+                response = self.client.get(
+                    SUBSCRIPTIONS_URL, {'cursor': value})
+                self.assertEqual(response.status_code, 404)
+
+    def test_cursor_rejects_other_ordering(self):
+        for params in ({'ordering': '-favorites_count'}, {'search': 'рецепт'}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    RECIPES_URL, {'cursor': '', **params})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+        response = self.client.get(
+            RECIPES_URL, {'ordering': '-favorites_count', 'search': ''})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,49 @@
+from rest_framework.test import APITestCase
+
+from recipes.models import CustomUser, Recipe
+from recipes.search import update_search_index
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        cls.recipes = {
+            name: Recipe.objects.create(
+                author=cls.author, name=name, text=text, cooking_time=10,
+                image='recipe.png').id
+            for name, text in (
+                ('Борщ', 'Свёкла и капуста'),
+                ('Щи', 'Как борщ, только без свёклы'),
+                ('Оладьи', 'Мука и кефир'),
+            )
+        }
+        update_search_index(cls.recipes.values())
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def search(self, query):
+        response = self.client.get(RECIPES_URL, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_name_match_ranks_first(self):
+        self.assertEqual(self.search('борщ'), ['Борщ', 'Щи'])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search('олад'), ['Оладьи'])
+
+    def test_query_without_words_finds_nothing(self):
+        self.assertEqual(self.search('?!'), [])
+
+    def test_index_follows_recipe_update(self):
+        url = f'{RECIPES_URL}{self.recipes["Оладьи"]}/'
+        response = self.client.patch(
+            url, {'name': 'Блины'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('олад'), [])
+        self.assertEqual(self.search('блины'), ['Блины'])
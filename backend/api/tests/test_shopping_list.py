@@ -0,0 +1,128 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.shopping_list import (CACHE_KEY, RecipeInvalidation,
+                               schedule_recipe_invalidation)
+from recipes.models import (Cart, CustomUser, Ingredient, Recipe,
+                            RecipeIngredient)
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/?format=txt'
+LOCMEM = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+@override_settings(CACHES=LOCMEM)
+class ShoppingListInvalidationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(
+            email='user@foodgram.local', username='user')
+        self.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        self.salt = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+        self.sugar = Ingredient.objects.create(
+            name='сахар', measurement_unit='г')
+        self.recipe = self.create_recipe({self.salt: 5})
+        Cart.objects.create(user=self.user, item=self.recipe)
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, amounts, author=None):
+        recipe = Recipe.objects.create(
+            author=author or self.author, name='Рецепт', text='Текст',
+            cooking_time=10, image='recipe.png')
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in amounts.items())
+        return recipe
+
+    def shopping_list(self):
+        response = self.client.get(DOWNLOAD_URL)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_cart_change_invalidates_list(self):
+        self.assertIn('соль(г) — 5', self.shopping_list())
+        other = self.create_recipe({self.sugar: 7})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/recipes/{other.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('сахар(г) — 7', self.shopping_list())
+
+    def test_ingredient_change_invalidates_list(self):
+        self.assertIn('соль(г) — 5', self.shopping_list())
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.recipe).delete()
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.sugar, amount=3)
+        self.assertEqual(self.shopping_list(), 'сахар(г) — 3\n')
+
+    def test_cart_change_waits_for_commit(self):
+        self.shopping_list()
+        key = CACHE_KEY.format(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Cart.objects.filter(user=self.user).delete()
+            self.assertIsNotNone(cache.get(key))
+        self.assertIsNone(cache.get(key))
+
+    def test_one_callback_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for amount in range(1, 4):
+                RecipeIngredient.objects.create(
+                    recipe=self.create_recipe({}), ingredient=self.sugar,
+                    amount=amount)
+        batches = [callback for callback in callbacks
+                   if isinstance(callback, RecipeInvalidation)]
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0].recipe_ids), 3)
+
+    def test_rolled_back_recipes_are_dropped(self):
+        other = self.create_recipe({self.sugar: 1})
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            schedule_recipe_invalidation([other.id])
+            raise RuntimeError
+        with self.captureOnCommitCallbacks() as callbacks:
+            schedule_recipe_invalidation([self.recipe.id])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(callbacks[0].recipe_ids, {self.recipe.id})
+
+    def test_author_deletion_invalidates_once(self):
+        for _ in range(5):
+            Cart.objects.create(
+                user=self.user,
+                item=self.create_recipe({self.salt: 1, self.sugar: 1}))
+        self.assertIn('соль(г) — 10', self.shopping_list())
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.author.delete()
+        cart_lookups = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT DISTINCT "recipes_cart"')
+        ]
+        self.assertLessEqual(len(cart_lookups), 1)
+        self.assertEqual(self.shopping_list(), '')
+
+
+class ShoppingListFormatTests(APITestCase):
+    url = '/api/recipes/download_shopping_cart/'
+
+    def test_errors_are_json_in_every_format(self):
+        for file_format in ('pdf', 'txt', 'csv'):
+            with self.subTest(file_format=file_format):
+                response = self.client.get(self.url, {'format': file_format})
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+    def test_file_keeps_its_content_type(self):
+        self.client.force_authenticate(CustomUser.objects.create(
+            email='user@foodgram.local', username='user'))
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
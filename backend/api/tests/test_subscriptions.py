@@ -0,0 +1,40 @@
+from rest_framework.test import APITestCase
+
+from recipes.models import CustomUser, Recipe
+
+USERS_URL = '/api/users/'
+
+
+class SubscribeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            email='user@foodgram.local', username='user')
+        cls.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipe.png').id
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self, params=''):
+        return self.client.post(
+            f'{USERS_URL}{self.author.id}/subscribe/{params}')
+
+    def test_recipes_limit_applies_to_follow_response(self):
+        response = self.subscribe('?recipes_limit=1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['recipes']],
+            [self.recipes[-1]])
+        self.assertEqual(response.data['recipes_count'], 3)
+
+    def test_invalid_recipes_limit_is_rejected(self):
+        response = self.subscribe('?recipes_limit=-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.user.user_followings.exists())
@@ -1,4 +1,26 @@
-from recipes.models import RecipeIngredient, RecipeTag
+from collections import Counter
+
+from rest_framework import serializers
+
+from recipes.models import Recipe, RecipeIngredient, RecipeTag, tag_mask
+
+
+def resolve_ids(model, ids, label):
+    """Загружает объекты одним запросом и сообщает обо всех ошибках."""
+    objects = model.objects.in_bulk(set(ids))
+    errors = []
+    missing = sorted(set(ids) - objects.keys())
+    if missing:
+        errors.append(
+            f'{label} не найдены: {", ".join(map(str, missing))}')
+    duplicates = sorted(
+        item for item, count in Counter(ids).items() if count > 1)
+    if duplicates:
+        errors.append(
+            f'{label} повторяются: {", ".join(map(str, duplicates))}')
+    if errors:
+        raise serializers.ValidationError(errors)
+    return objects
 
 
 def bulk_create_recipe_ingredients(recipe, ingredients):
@@ -27,3 +49,58 @@ def bulk_create_recipe_tags(recipe, tags):
         )
         tags_list.append(tag_obj)
     RecipeTag.objects.bulk_create(tags_list)
+    set_tag_mask(recipe, tag_mask(tag.id for tag in tags))
+
+
+def set_tag_mask(recipe, mask):
+    if recipe.tag_mask != mask:
+        recipe.tag_mask = mask
+        Recipe.objects.filter(pk=recipe.pk).update(tag_mask=mask)
+
+
+def update_recipe_ingredients(recipe, ingredients):
+    amounts = {
+        ingredient['id'].id: ingredient['amount']
+        for ingredient in ingredients
+    }
+    to_delete = []
+    to_update = []
+    for recipe_ingredient in recipe.recipe_recipeingredients.all():
+        amount = amounts.pop(recipe_ingredient.ingredient_id, None)
+        if amount is None:
+            to_delete.append(recipe_ingredient.id)
+        elif recipe_ingredient.amount != amount:
+            recipe_ingredient.amount = amount
+            to_update.append(recipe_ingredient)
+    to_create = [
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredient_id,
+            amount=amount
+        )
+        for ingredient_id, amount in amounts.items()
+    ]
+
+    if to_delete:
+        RecipeIngredient.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+    if to_create:
+        RecipeIngredient.objects.bulk_create(to_create)
+    return bool(to_delete or to_update or to_create)
+
+
+def update_recipe_tags(recipe, tags):
+    new_ids = {tag.id for tag in tags}
+    old_ids = set(recipe.recipe_recipetags.order_by().values_list(
+        'tag_id', flat=True))
+    removed = old_ids - new_ids
+    added = new_ids - old_ids
+
+    if removed:
+        recipe.recipe_recipetags.filter(tag_id__in=removed).delete()
+    if added:
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id) for tag_id in added)
+    set_tag_mask(recipe, tag_mask(new_ids))
+    return bool(removed or added)
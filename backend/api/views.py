@@ -1,46 +1,74 @@
-from django.db.models import Sum
-from django.http import FileResponse
+import json
+
+from django.conf import settings
+from django.db.models import F, Prefetch, Value
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen.canvas import Canvas
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.conditional import (CacheControlMixin, recipe_etag, version_etag,
+                             version_last_modified)
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import FollowPagination
+from api.ingredient_index import ingredient_index
+from api.pagination import FollowPagination, KeysetPagination, RecipePagination
 from api.permissions import AuthUserDelete, RecipePermissions
 from api.serializers import (FavoriteCartSerializer, FollowSerializer,
                              IngredientSerializer, RecipeCrUpSerializer,
-                             RecipeReadSerializer, TagSerializer)
+                             RecipeReadSerializer,
+                             SubscriptionsParamsSerializer, TagSerializer)
+from api.shopping_list import (RENDERER_CLASSES, get_shopping_list,
+                               shopping_list_response)
+from foodgram.metrics import store as metrics_store
+from recipes.bulk import RecipeImporter, export_recipes
 from recipes.models import (Cart, CustomUser, Favorite, Follow, Ingredient,
-                            Recipe, RecipeIngredient, Tag)
+                            Recipe, Tag)
+from recipes.timeline import feed_rows
+from recipes.versions import INGREDIENTS, TAGS
+
 
-SIZE_FONTS = 12
-X_POINT = 50
-Y_POINT = 750
-DECREASE_Y_POINT = 20
+def subscriptions_queryset(user, recipes_limit=None):
+    """Подписки пользователя с рецептами авторов за один запрос.
+
+    Срез в Prefetch Django выполняет через ROW_NUMBER() OVER
+    (PARTITION BY author), поэтому лимит применяется к каждому автору.
+    """
+    recipes = Recipe.objects.order_by('-created', '-id')
+    if recipes_limit is not None:
+        recipes = recipes[:recipes_limit]
+    return CustomUser.objects.filter(
+        author_followers__user=user
+    ).annotate(
+        follow_id=F('author_followers__id'),
+        is_subscribed=Value(True)
+    ).prefetch_related(Prefetch(
+        'author_recipes', queryset=recipes, to_attr='subscription_recipes'))
 
 
 class CustomDjoserUserViewSet(DjoserUserViewSet):
     queryset = CustomUser.objects.all()
 
-    @action(detail=False)
+    def get_queryset(self):
+        return super().get_queryset().with_subscription_flag(
+            self.request.user)
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request, *args, **kwargs):
         paginator = FollowPagination()
-        user = self.request.user
-        limit = self.request.query_params.get('recipes_limit', None)
-        queryset = CustomUser.objects.filter(author_followers__user=user)
+        params = SubscriptionsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = subscriptions_queryset(
+            request.user, params.validated_data.get('recipes_limit'))
         result_page = paginator.paginate_queryset(queryset, request)
         serializer = FollowSerializer(
-            result_page,
-            many=True,
-            context={
-                'limit': limit,
-            })
+            result_page, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
 
     @action(
@@ -52,13 +80,16 @@ class CustomDjoserUserViewSet(DjoserUserViewSet):
         user = request.user
         author_id = kwargs.get('id')
         author = get_object_or_404(CustomUser, id=author_id)
+        params = SubscriptionsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
         Follow.objects.create(user=user, author=author)
         serializer = FollowSerializer(
             author,
             context={
                 'request': request,
                 'author': author,
-                'author_id': author_id
+                'author_id': author_id,
+                'recipes_limit': params.validated_data.get('recipes_limit')
             })
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -77,11 +108,20 @@ class CustomDjoserUserViewSet(DjoserUserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+@method_decorator(
+    condition(etag_func=recipe_etag),
+    name='retrieve'
+)
+class RecipeViewSet(CacheControlMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [RecipePermissions]
-    filter_backends = (DjangoFilterBackend,)
+    pagination_class = RecipePagination
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('created', 'favorites_count', 'cart_count')
+
+    def get_queryset(self):
+        return Recipe.objects.for_read(self.request.user)
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -124,41 +164,77 @@ class RecipeViewSet(viewsets.ModelViewSet):
         objects.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(methods=['get'], detail=True)
+    @action(
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=RENDERER_CLASSES
+    )
     def download_shopping_cart(self, request, *args, **kwargs):
-        all_ingredients = []
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__author__username=request.user.username
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit').annotate(
-                amount=Sum('amount'))
-        for ingredient in ingredients:
-            ingredient_info = {
-                'name': ingredient['ingredient__name'],
-                'unit': ingredient['ingredient__measurement_unit'],
-                'amount': int(ingredient['amount'])
-            }
-            all_ingredients.append(ingredient_info)
-
-        font = '/app/api/fonts/Arial.ttf'
-        pdfmetrics.registerFont(TTFont('Arial', font))
-        file_pdf = Canvas('shop_list.pdf')
-        file_pdf.setFont('Arial', SIZE_FONTS)
-        y_coordinate = Y_POINT
-        for ingredient in all_ingredients:
-            ingredient_text = (f'{ingredient["name"]}'
-                               f'({ingredient["unit"]}) — '
-                               f'{ingredient["amount"]}')
-            file_pdf.drawString(X_POINT, y_coordinate, ingredient_text)
-            y_coordinate -= DECREASE_Y_POINT
-        file_pdf.showPage()
-        file_pdf.save()
-        pdf_file_path = 'shop_list.pdf'
-        response = FileResponse(
-            open(pdf_file_path, 'rb'), content_type='application/pdf')
-        response[
-            'Content-Disposition'] = 'attachment; filename="shop_list.pdf"'
-        return response
+        ingredients = get_shopping_list(request.user)
+        return shopping_list_response(
+            ingredients, request.accepted_renderer.format)
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request, *args, **kwargs):
+        paginator = KeysetPagination(
+            RecipePagination.keyset_ordering,
+            RecipePagination().get_page_size(request))
+        paginator.request = request
+        cursor = request.query_params.get(paginator.cursor_query_param)
+        rows = feed_rows(
+            request.user,
+            paginator.decode_cursor(cursor) if cursor else None,
+            paginator.page_size + 1)
+        recipes = self.get_queryset().in_bulk([pk for _, pk in rows])
+        page = paginator.set_page(
+            [recipes[pk] for _, pk in rows if pk in recipes])
+        serializer = RecipeReadSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        url_path='export',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def export_recipes(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(Recipe.objects.all())
+        return StreamingHttpResponse(
+            export_recipes(queryset), content_type='application/x-ndjson')
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def import_recipes(self, request, *args, **kwargs):
+        """Импортирует тело запроса целиком и отдаёт отчёт о пачках.
+
+        Вся работа с базой идёт внутри представления, чтобы ошибки
+        обрабатывал DRF, а запросы видел MetricsMiddleware.
+        """
+        if request.stream is None:
+            raise ParseError(
+                'Пустое тело запроса: передайте NDJSON с Content-Length.')
+        is_staff = request.user.is_staff
+        importer = RecipeImporter(
+            author=None if is_staff else request.user,
+            own_images_only=not is_staff)
+        try:
+            report = [
+                json.dumps(progress, ensure_ascii=False) + '\n'
+                for progress in importer.run(
+                    iter(request.stream.readline, b''))
+            ]
+        except OSError:
+            raise ParseError(
+                'Не удалось прочитать тело запроса после строки '
+                f'{importer.processed}.')
+        if not importer.processed:
+            raise ParseError('В теле запроса нет рецептов.')
+        report.append(json.dumps(importer.summary()) + '\n')
+        return HttpResponse(report, content_type='application/x-ndjson')
 
     @action(detail=True, methods=['post'])
     def favorite(self, request, *args, **kwargs):
@@ -189,17 +265,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+tags_condition = condition(
+    etag_func=version_etag(TAGS),
+    last_modified_func=version_last_modified(TAGS)
+)
+ingredients_condition = condition(
+    etag_func=version_etag(INGREDIENTS),
+    last_modified_func=version_last_modified(INGREDIENTS)
+)
+
+
+@method_decorator(tags_condition, name='list')
+@method_decorator(tags_condition, name='retrieve')
+class TagViewSet(CacheControlMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny, ]
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+@method_decorator(ingredients_condition, name='list')
+@method_decorator(ingredients_condition, name='retrieve')
+class IngredientViewSet(CacheControlMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny, ]
     pagination_class = None
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(
+                name, settings.INGREDIENT_SEARCH_LIMIT))
+        return super().list(request, *args, **kwargs)
+
+
+class MetricsView(APIView):
+    """Счётчики запросов и времени ответа, собранные MetricsMiddleware."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics_store.snapshot())
+
+    def delete(self, request):
+        metrics_store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
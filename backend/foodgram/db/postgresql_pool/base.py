@@ -0,0 +1,130 @@
+import logging
+import queue
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+WAIT_LOG_THRESHOLD = 0.01
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Ограничивает число соединений процесса и хранит свободные."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.acquired = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self):
+        """Занимает слот и отдаёт свободное соединение или None."""
+        start = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(
+                f'Нет свободных соединений в пуле за {self.timeout} с')
+        wait = time.perf_counter() - start
+        with self.lock:
+            self.in_use += 1
+            self.acquired += 1
+            self.wait_time += wait
+            self.max_wait = max(self.max_wait, wait)
+        if wait > WAIT_LOG_THRESHOLD:
+            logger.warning('Ожидание соединения из пула: %.1f мс', wait * 1000)
+        try:
+            return self.idle.get_nowait(), wait
+        except queue.Empty:
+            return None, wait
+
+    def release(self, connection=None):
+        if connection is not None:
+            self.idle.put(connection)
+        with self.lock:
+            self.in_use -= 1
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': self.idle.qsize(),
+                'acquired': self.acquired,
+                'wait_ms_total': round(self.wait_time * 1000, 2),
+                'wait_ms_max': round(self.max_wait * 1000, 2),
+            }
+
+
+def get_pool(alias, settings_dict):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(
+                settings_dict.get('POOL_SIZE', 4),
+                settings_dict.get('POOL_TIMEOUT', 10))
+        return pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений на процесс.
+
+    close() возвращает соединение в пул, а не закрывает его, поэтому
+    CONN_MAX_AGE = 0 означает возврат в пул после каждого запроса.
+    """
+
+    pool_wait = 0.0
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connection, self.pool_wait = self.pool.acquire()
+        try:
+            if connection is not None and self.is_reusable(connection):
+                return connection
+            if connection is not None:
+                connection.close()
+            return super().get_new_connection(conn_params)
+        except Exception:
+            self.pool.release()
+            raise
+
+    def is_reusable(self, connection):
+        if connection.closed:
+            return False
+        if not self.settings_dict['CONN_HEALTH_CHECKS']:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        connection = self.connection
+        status = (extensions.TRANSACTION_STATUS_UNKNOWN if connection.closed
+                  else connection.get_transaction_status())
+        try:
+            if (self.in_atomic_block
+                    or status == extensions.TRANSACTION_STATUS_UNKNOWN):
+                connection.close()
+                connection = None
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except base.Database.Error:
+            connection.close()
+            connection = None
+        finally:
+            self.pool.release(connection)
@@ -0,0 +1,62 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+PRIMARY_APPS = {'authtoken'}
+
+read_database = ContextVar('read_database', default=None)
+unhealthy_until = {}
+
+
+def is_healthy(alias):
+    return unhealthy_until.get(alias, 0) <= time.monotonic()
+
+
+def mark_unhealthy(alias):
+    """Исключает реплику на REPLICA_RETRY_SECONDS, если сбой в ней.
+
+    Вызывается только после OperationalError, поэтому обычное чтение
+    обходится без проверки соединения.
+    """
+    connection = connections[alias]
+    try:
+        if connection.connection is not None and connection.is_usable():
+            return False
+    except DatabaseError:
+        pass
+    logger.error('Реплика %s недоступна', alias)
+    connection.close()
+    unhealthy_until[alias] = (
+        time.monotonic() + settings.REPLICA_RETRY_SECONDS)
+    return True
+
+
+def choose_replica():
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    """Отправляет чтение на реплику, выбранную ReplicaMiddleware."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        return read_database.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
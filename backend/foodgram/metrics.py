@@ -0,0 +1,213 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_LIST = re.compile(r'%s(?:, %s)+')
+MAX_SUSPECTS = 20
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def query_shape(sql):
+    """Текст запроса без длины списков IN (...)."""
+    return PLACEHOLDER_LIST.sub('%s, ...', sql)
+
+
+def view_label(request):
+    """Имя представления и действия, например RecipeViewSet.list."""
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    method = request.method.lower()
+    view = getattr(match.func, 'cls', None)
+    if view is None:
+        return f'{match.func.__module__}.{match.func.__name__}.{method}'
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view.__name__}.{actions.get(method, method)}'
+
+
+class QueryRecorder:
+    """execute_wrapper, считающий запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def record(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def suspects(self, threshold):
+        """Одинаковые SELECT, повторённые threshold раз и больше."""
+        return {
+            shape: count for shape, count in self.shapes.items()
+            if count >= threshold and shape.lstrip().startswith('SELECT')
+        }
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.label = None
+        self.queries = QueryRecorder()
+        self.start = time.perf_counter()
+        self.serialize = 0.0
+        self.serializing = False
+        self.render = 0.0
+        self.total = 0.0
+
+    def finish(self, label):
+        self.label = label
+        self.total = time.perf_counter() - self.start
+
+    def server_timing(self):
+        db = self.queries.duration
+        app = max(self.total - db - self.serialize - self.render, 0.0)
+        return ', '.join((
+            f'db;dur={db * 1000:.1f};desc="{self.queries.count} queries"',
+            f'app;dur={app * 1000:.1f}',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+
+class TimedSerializerMixin:
+    """Засчитывает to_representation в время сериализации запроса.
+
+    Вложенные сериализаторы не считаются повторно, а запросы к базе
+    из сериализатора остаются во времени базы.
+    """
+
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+        metrics.serializing = True
+        db = metrics.queries.duration
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serialize += (time.perf_counter() - start
+                                  - (metrics.queries.duration - db))
+            metrics.serializing = False
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ViewStats:
+    def __init__(self, window):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.durations = deque(maxlen=window)
+        self.suspects = {}
+
+    def add(self, metrics, suspects):
+        self.requests += 1
+        self.queries += metrics.queries.count
+        self.max_queries = max(self.max_queries, metrics.queries.count)
+        self.db += metrics.queries.duration
+        self.serialize += metrics.serialize
+        self.render += metrics.render
+        self.durations.append(metrics.total)
+        for shape, count in suspects.items():
+            if shape in self.suspects or len(self.suspects) < MAX_SUSPECTS:
+                self.suspects[shape] = max(self.suspects.get(shape, 0), count)
+
+    def as_dict(self):
+        durations = list(self.durations)
+        return {
+            'requests': self.requests,
+            'queries_avg': round(self.queries / self.requests, 1),
+            'queries_max': self.max_queries,
+            'db_ms_avg': round(self.db * 1000 / self.requests, 2),
+            'serialize_ms_avg': round(
+                self.serialize * 1000 / self.requests, 2),
+            'render_ms_avg': round(self.render * 1000 / self.requests, 2),
+            'total_ms_p50': round(percentile(durations, 0.5) * 1000, 2),
+            'total_ms_p95': round(percentile(durations, 0.95) * 1000, 2),
+            'total_ms_p99': round(percentile(durations, 0.99) * 1000, 2),
+            'n_plus_one': [
+                {'query': shape, 'repeats': count}
+                for shape, count in sorted(
+                    self.suspects.items(), key=lambda item: -item[1])
+            ],
+        }
+
+
+class MetricsStore:
+    """Агрегаты по представлениям в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, metrics):
+        suspects = metrics.queries.suspects(settings.METRICS_N_PLUS_ONE)
+        for shape, count in suspects.items():
+            logger.warning('Возможный N+1 в %s: %s одинаковых запросов %s',
+                           metrics.label, count, shape)
+        with self.lock:
+            stats = self.views.get(metrics.label)
+            if stats is None:
+                stats = self.views[metrics.label] = ViewStats(
+                    settings.METRICS_WINDOW)
+            stats.add(metrics, suspects)
+
+    def snapshot(self):
+        with self.lock:
+            views = {
+                label: stats.as_dict()
+                for label, stats in sorted(self.views.items())
+            }
+        return {
+            'pid': os.getpid(),
+            'sample_rate': settings.METRICS_SAMPLE_RATE,
+            'views': views,
+            'pools': pool_stats(),
+        }
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+def pool_stats():
+    if not settings.DB_POOL_SIZE:
+        return {}
+    from foodgram.db.postgresql_pool.base import pools
+    return {alias: pool.stats() for alias, pool in list(pools.items())}
+
+
+store = MetricsStore()
@@ -0,0 +1,144 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError
+
+from foodgram.db_router import choose_replica, mark_unhealthy, read_database
+from foodgram.metrics import RequestMetrics, current_metrics, store, view_label
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'replica_pin'
+PIN_SALT = 'foodgram.replica_pin'
+
+
+def is_pinned(request):
+    """Клиент недавно писал: подписанная кука ещё не истекла."""
+    return request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS) is not None
+
+
+def wants_replica(request):
+    return (bool(settings.DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and request.path.startswith(settings.REPLICA_PATHS)
+            and not is_pinned(request))
+
+
+def pin(request, response):
+    if (settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS
+            and response.status_code < 400):
+        response.set_signed_cookie(
+            PIN_COOKIE, '1', salt=PIN_SALT,
+            max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+            samesite='Lax')
+    return response
+
+
+class ReplicaMiddleware:
+    """Направляет безопасные запросы к репликам.
+
+    После успешной записи клиент получает подписанную куку и на
+    REPLICA_PIN_SECONDS читает с основной базы, чтобы сразу видеть свои
+    изменения. Кука не зависит от кеша, поэтому закрепление работает
+    во всех процессах gunicorn и на всех серверах. Реплика, на которой
+    запрос упал с OperationalError, исключается на REPLICA_RETRY_SECONDS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias = choose_replica() if wants_replica(request) else None
+        token = read_database.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return pin(request, response)
+
+    async def __acall__(self, request):
+        alias = choose_replica() if wants_replica(request) else None
+        token = read_database.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return pin(request, response)
+
+    def process_exception(self, request, exception):
+        alias = read_database.get()
+        if alias and isinstance(exception, OperationalError):
+            mark_unhealthy(alias)
+
+
+class MetricsMiddleware:
+    """Считает запросы к базе и время ответа по представлениям.
+
+    Замеряется доля METRICS_SAMPLE_RATE запросов; при нуле middleware
+    отключается целиком. Агрегаты отдаёт /api/metrics/.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        metrics = request._metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with metrics.queries.record():
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        metrics = request._metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with metrics.queries.record():
+                response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, '_metrics', None)
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.render = time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        metrics.finish(view_label(request))
+        store.add(metrics)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        return response
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 from dotenv import load_dotenv
@@ -10,8 +11,9 @@ SECRET_KEY = os.getenv('SECRET_KEY', default='secret_key')
 
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
-CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS').split(',')
-ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS').split(',')
+CSRF_TRUSTED_ORIGINS = os.getenv(
+    'CSRF_TRUSTED_ORIGINS', 'http://localhost').split(',')
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 
 INSTALLED_APPS = [
@@ -32,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +42,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -62,17 +66,101 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
-DATABASES = {
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
+# DB_ENGINE=sqlite — локальная разработка и тесты без PostgreSQL.
+DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': ('foodgram.db.postgresql_pool' if DB_POOL_SIZE
+                       else 'django.db.backends.postgresql'),
+            'NAME': os.getenv('POSTGRES_DB', 'django'),
+            'USER': os.getenv('POSTGRES_USER', 'django'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', 5432),
+            # С пулом соединение возвращается в него после каждого запроса:
+            # постоянное соединение Django держало бы слот пула за собой.
+            'CONN_MAX_AGE': (0 if DB_POOL_SIZE
+                             else int(os.getenv('DB_CONN_MAX_AGE', 60))),
+            'CONN_HEALTH_CHECKS': os.getenv(
+                'DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+            'POOL_SIZE': DB_POOL_SIZE,
+            'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    }
+# Миграции не хранятся в репозитории, тестовая база строится по моделям.
+DATABASES['default']['TEST'] = {'MIGRATE': False}
+
+# Реплики копируют default с другим хостом (DB_REPLICA_HOSTS) или,
+# для SQLite, с другим файлом (DB_REPLICA_NAMES).
+REPLICA_SETTING, REPLICA_ENV = (
+    ('NAME', 'DB_REPLICA_NAMES') if DB_ENGINE == 'sqlite'
+    else ('HOST', 'DB_REPLICA_HOSTS'))
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+        filter(None, os.getenv(REPLICA_ENV, '').split(',')), start=1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        REPLICA_SETTING: location.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+REPLICA_PATHS = (
+    '/api/recipes/', '/api/tags/', '/api/ingredients/',
+    '/api/users/subscriptions/',
+)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', 30))
+
+# Кеш должен быть общим для всех процессов gunicorn: сброс списка
+# покупок после записи в одном процессе иначе не виден остальным.
+# FileBasedCache общий в пределах контейнера, для нескольких серверов
+# нужен Redis или Memcached. С LocMemCache списки покупок живут
+# не дольше LOCMEM_SHOPPING_LIST_TIMEOUT секунд.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB', 'django'),
-        'USER': os.getenv('POSTGRES_USER', 'django'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache')),
     }
 }
 
+LOCMEM_SHOPPING_LIST_TIMEOUT = 30
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', 60 * 60 * 24))
+if CACHE_BACKEND.endswith('.LocMemCache'):
+    SHOPPING_LIST_CACHE_TIMEOUT = min(
+        SHOPPING_LIST_CACHE_TIMEOUT, LOCMEM_SHOPPING_LIST_TIMEOUT)
+
+ANONYMOUS_CACHE_MAX_AGE = int(os.getenv('ANONYMOUS_CACHE_MAX_AGE', 60))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0))
+METRICS_N_PLUS_ONE = int(os.getenv('METRICS_N_PLUS_ONE', 5))
+METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', 1000))
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -148,4 +236,18 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'recipes.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+IMAGE_GC_GRACE_PERIOD = int(os.getenv('IMAGE_GC_GRACE_PERIOD', 60 * 60))
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 8000))
+
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
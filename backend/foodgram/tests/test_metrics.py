@@ -0,0 +1,60 @@
+import re
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api.serializers import RecipeReadSerializer
+from foodgram.metrics import RequestMetrics, current_metrics, store
+from recipes.models import CustomUser, Recipe, Tag
+
+TIMING = re.compile(r'(\w+);dur=([\d.]+)')
+
+
+@override_settings(METRICS_SAMPLE_RATE=1, SERVER_TIMING=True)
+class MetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            email='admin@foodgram.local', username='admin', is_staff=True)
+        tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                 slug='breakfast')
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.admin, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipe.png')
+            recipe.tags.add(tag)
+
+    def setUp(self):
+        store.reset()
+
+    def phases(self, response):
+        return dict(TIMING.findall(response['Server-Timing']))
+
+    def test_server_timing_reports_serialization(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        phases = self.phases(response)
+        self.assertEqual(
+            set(phases), {'db', 'app', 'serialize', 'render', 'total'})
+        self.assertGreater(float(phases['serialize']), 0)
+
+    def test_nested_serializers_are_counted_once(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with mock.patch('foodgram.metrics.time.perf_counter',
+                            side_effect=[0.0, 1.0] * 3):
+                data = RecipeReadSerializer(
+                    Recipe.objects.all(), many=True,
+                    context={'request': None}).data
+        finally:
+            current_metrics.reset(token)
+        self.assertEqual(len(data), 3)
+        self.assertEqual(metrics.serialize, 3.0)
+
+    def test_snapshot_reports_serialization(self):
+        self.client.get('/api/recipes/')
+        self.client.force_authenticate(self.admin)
+        views = self.client.get('/api/metrics/').data['views']
+        self.assertGreater(views['RecipeViewSet.list']['serialize_ms_avg'], 0)
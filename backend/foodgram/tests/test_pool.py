@@ -0,0 +1,83 @@
+from unittest import skipUnless
+
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from foodgram.db.postgresql_pool.base import (ConnectionPool, DatabaseWrapper,
+                                              base, pools)
+
+POOL_ALIAS = 'pool_test'
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_checkout_return_and_timeout(self):
+        pool = ConnectionPool(size=1, timeout=0.01)
+        self.assertIsNone(pool.acquire()[0])
+        with self.assertRaises(base.Database.OperationalError):
+            pool.acquire()
+        raw = object()
+        pool.release(raw)
+        self.assertEqual(pool.stats()['idle'], 1)
+        self.assertIs(pool.acquire()[0], raw)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_broken_connection_frees_slot(self):
+        pool = ConnectionPool(size=1, timeout=0.01)
+        pool.acquire()
+        pool.release(None)
+        self.assertEqual(pool.stats()['in_use'], 0)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertIsNone(pool.acquire()[0])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'нужен PostgreSQL')
+class PooledWrapperTests(TransactionTestCase):
+    """Пул поверх настоящего PostgreSQL из настроек default."""
+
+    def setUp(self):
+        pools.pop(POOL_ALIAS, None)
+        self.wrappers = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        pool = pools.pop(POOL_ALIAS, None)
+        while pool and not pool.idle.empty():
+            pool.idle.get_nowait().close()
+
+    def wrapper(self):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'foodgram.db.postgresql_pool',
+            'POOL_SIZE': 1,
+            'POOL_TIMEOUT': 0.1,
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+        }, POOL_ALIAS)
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def test_closed_connection_returns_to_pool(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        self.assertEqual(first.pool.stats()['in_use'], 1)
+        with self.assertRaises(OperationalError):
+            self.wrapper().ensure_connection()
+        first.close()
+        self.assertEqual(first.pool.stats()['idle'], 1)
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+
+    def test_dirty_connection_is_rolled_back(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        first.set_autocommit(False)
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE pool_probe (id int)')
+        first.close()
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pg_temp.pool_probe')")
+            self.assertIsNone(cursor.fetchone()[0])
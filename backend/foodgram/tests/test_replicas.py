@@ -0,0 +1,66 @@
+import time
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from foodgram.db_router import ReplicaRouter, unhealthy_until
+from foodgram.middleware import PIN_COOKIE, ReplicaMiddleware
+from recipes.models import Recipe
+
+RECIPES_URL = '/api/recipes/'
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        unhealthy_until.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def call(self, method, path=RECIPES_URL, status=200):
+        used = {}
+
+        def view(request):
+            used['read'] = self.router.db_for_read(Recipe)
+            used['token'] = self.router.db_for_read(Token)
+            used['write'] = self.router.db_for_write(Recipe)
+            return HttpResponse(status=status)
+
+        request = getattr(self.factory, method)(path)
+        return ReplicaMiddleware(view)(request), used
+
+    def test_get_reads_from_replica(self):
+        _, used = self.call('get')
+        self.assertEqual(used['read'], 'replica')
+        self.assertEqual(used['token'], 'default')
+
+    def test_write_goes_to_default_and_pins(self):
+        response, used = self.call('post')
+        self.assertEqual(used['read'], 'default')
+        self.assertEqual(used['write'], 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_get_after_write_stays_on_default(self):
+        response, _ = self.call('post')
+        self.factory.cookies[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        _, used = self.call('get')
+        self.assertEqual(used['read'], 'default')
+
+    def test_forged_pin_is_ignored(self):
+        self.factory.cookies[PIN_COOKIE] = '1'
+        _, used = self.call('get')
+        self.assertEqual(used['read'], 'replica')
+
+    def test_failed_write_does_not_pin(self):
+        response, _ = self.call('post', status=400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_other_paths_read_from_default(self):
+        _, used = self.call('get', '/api/users/me/')
+        self.assertEqual(used['read'], 'default')
+
+    def test_unhealthy_replica_is_skipped(self):
+        unhealthy_until['replica'] = time.monotonic() + 60
+        _, used = self.call('get')
+        self.assertEqual(used['read'], 'default')
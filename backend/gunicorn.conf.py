@@ -0,0 +1,8 @@
+import os
+
+ASGI = os.getenv('ASGI', 'False') == 'True'
+
+wsgi_app = 'foodgram.asgi:application' if ASGI else 'foodgram.wsgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker' if ASGI else 'sync'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
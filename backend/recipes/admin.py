@@ -3,6 +3,7 @@ from import_export.admin import ImportExportModelAdmin
 
 from .models import (Cart, CustomUser, Favorite, Follow, Ingredient, Recipe,
                      RecipeIngredient, Tag)
+from .search import update_search_index
 
 
 class CustomUserAdmin(admin.ModelAdmin):
@@ -11,7 +12,9 @@ class CustomUserAdmin(admin.ModelAdmin):
         'username',
         'first_name',
         'last_name',
-        'id'
+        'id',
+        'recipes_count',
+        'followers_count'
     )
     list_filter = ('email', 'username',)
 
@@ -28,12 +31,17 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
-        'added_to_fav',
+        'favorites_count',
+        'cart_count',
     )
     search_fields = ('name',)
     list_filter = ('author', 'name', 'tags',)
     readonly_fields = ('author',)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_search_index([form.instance.pk])
+
 
 class RecipeTagAdmin(admin.ModelAdmin):
     list_display = (
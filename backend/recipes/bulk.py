@@ -0,0 +1,247 @@
+import json
+from collections import Counter
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch
+
+from recipes.counters import change_counter
+from recipes.images import schedule_variants
+from recipes.models import (CustomUser, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, Tag, tag_mask)
+from recipes.search import update_search_index
+from recipes.seed import chunked
+from recipes.storage import is_content_addressed
+from recipes.timeline import fan_out
+
+BATCH_SIZE = 500
+MIN_VALUE = 1
+MAX_VALUE = 32000
+MAX_LEN_NAME = 200
+
+
+def export_recipes(queryset, chunk_size=BATCH_SIZE):
+    """Отдаёт рецепты построчно в формате NDJSON."""
+    queryset = queryset.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe_recipeingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        )
+    )
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        yield json.dumps({
+            'id': recipe.id,
+            'author': recipe.author.email,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': recipe.image.name,
+            'tags': [tag.slug for tag in recipe.tags.all()],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.recipe_recipeingredients.all()
+            ],
+        }, ensure_ascii=False) + '\n'
+
+
+def is_amount(value):
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and MIN_VALUE <= value <= MAX_VALUE)
+
+
+def parse_row(line):
+    """Разбирает строку и проверяет поля, не обращаясь к базе."""
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return None, ['Строка не является JSON.']
+    if not isinstance(row, dict):
+        return None, ['Ожидается JSON-объект.']
+    errors = []
+    name = row.get('name')
+    if not isinstance(name, str) or not 0 < len(name) <= MAX_LEN_NAME:
+        errors.append('name: обязательная строка до 200 символов.')
+    if not isinstance(row.get('text'), str) or not row['text']:
+        errors.append('text: обязательная строка.')
+    if not is_amount(row.get('cooking_time')):
+        errors.append(f'cooking_time: число от {MIN_VALUE} до {MAX_VALUE}.')
+    if not isinstance(row.get('image'), str) or not row['image']:
+        errors.append('image: обязательный путь к файлу в MEDIA_ROOT.')
+    tags = row.get('tags')
+    if (not isinstance(tags, list)
+            or not all(isinstance(slug, str) for slug in tags)):
+        errors.append('tags: список слагов.')
+    ingredients = row.get('ingredients')
+    if not isinstance(ingredients, list) or not all(
+            isinstance(item, dict)
+            and isinstance(item.get('name'), str)
+            and isinstance(item.get('measurement_unit'), str)
+            and is_amount(item.get('amount'))
+            for item in ingredients):
+        errors.append('ingredients: список объектов с name, '
+                      'measurement_unit и amount.')
+    return row, errors
+
+
+class RecipeImporter:
+    """Импортирует рецепты из NDJSON пачками, каждая в своей транзакции.
+
+    С own_images_only рецепт может сослаться только на изображение,
+    которое уже есть у рецептов author: чужие файлы из MEDIA_ROOT так
+    не подключить.
+    """
+
+    def __init__(self, author=None, batch_size=BATCH_SIZE,
+                 own_images_only=False):
+        self.author = author
+        self.batch_size = batch_size
+        self.own_images_only = own_images_only
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.processed = 0
+        self.created = 0
+        self.failed = 0
+
+    def resolve(self, rows):
+        names = {
+            item['name'] for _, row in rows for item in row['ingredients']}
+        ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in=names).values_list('id', 'name', 'measurement_unit')
+        }
+        authors = {}
+        if self.author is None:
+            authors = dict(CustomUser.objects.filter(
+                email__in={row.get('author') for _, row in rows}
+            ).values_list('email', 'id'))
+        self.own_images = set()
+        if self.own_images_only:
+            self.own_images = set(Recipe.objects.filter(
+                author=self.author,
+                image__in={row['image'] for _, row in rows}
+            ).values_list('image', flat=True))
+        return ingredients, authors
+
+    def image_error(self, name):
+        if self.own_images_only:
+            if not is_content_addressed(name) or name not in self.own_images:
+                return (f'image: файл {name} не принадлежит вашим рецептам; '
+                        'загрузите изображение через API.')
+        try:
+            exists = default_storage.exists(name)
+        except SuspiciousFileOperation:
+            return f'image: недопустимый путь {name}.'
+        if not exists:
+            return f'image: файл {name} не найден.'
+        return None
+
+    def build(self, row, ingredients, authors):
+        errors = []
+        author_id = (self.author.id if self.author
+                     else authors.get(row.get('author')))
+        if author_id is None:
+            errors.append(f'author: пользователь {row.get("author")} '
+                          'не найден.')
+        unknown_tags = [slug for slug in row['tags'] if slug not in self.tags]
+        if unknown_tags:
+            errors.append(f'tags: не найдены {", ".join(unknown_tags)}.')
+        keys = [(item['name'], item['measurement_unit'])
+                for item in row['ingredients']]
+        unknown = [f'{name} ({unit})' for name, unit in keys
+                   if (name, unit) not in ingredients]
+        if unknown:
+            errors.append(f'ingredients: не найдены {", ".join(unknown)}.')
+        if len(set(keys)) != len(keys):
+            errors.append('ingredients: ингредиенты повторяются.')
+        image_error = self.image_error(row['image'])
+        if image_error:
+            errors.append(image_error)
+        if errors:
+            return None, errors
+        tag_ids = {self.tags[slug] for slug in row['tags']}
+        recipe = Recipe(
+            author_id=author_id,
+            name=row['name'],
+            text=row['text'],
+            cooking_time=row['cooking_time'],
+            image=row['image'],
+            tag_mask=tag_mask(tag_ids),
+        )
+        amounts = [
+            (ingredients[key], item['amount'])
+            for key, item in zip(keys, row['ingredients'])
+        ]
+        return (recipe, tag_ids, amounts), None
+
+    def save(self, items):
+        recipes = [recipe for recipe, _, _ in items]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag_id=tag_id)
+                for recipe, tag_ids, _ in items for tag_id in tag_ids)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+                for recipe, _, amounts in items
+                for ingredient_id, amount in amounts)
+            authors = Counter(recipe.author_id for recipe in recipes)
+            for author_id, count in authors.items():
+                change_counter(CustomUser, author_id, 'recipes_count', count)
+            update_search_index([recipe.id for recipe in recipes])
+            fan_out(recipes)
+            for recipe in recipes:
+                schedule_variants(recipe)
+
+    def import_batch(self, batch):
+        errors = []
+        rows = []
+        for number, line in batch:
+            row, row_errors = parse_row(line)
+            if row_errors:
+                errors.append({'line': number, 'errors': row_errors})
+            else:
+                rows.append((number, row))
+        ingredients, authors = self.resolve(rows)
+        items = []
+        for number, row in rows:
+            item, row_errors = self.build(row, ingredients, authors)
+            if row_errors:
+                errors.append({'line': number, 'errors': row_errors})
+            else:
+                items.append(item)
+        if items:
+            self.save(items)
+        self.processed += len(batch)
+        self.created += len(items)
+        self.failed += len(errors)
+        return errors
+
+    def run(self, lines):
+        """Для каждой пачки отдаёт отчёт о прогрессе и ошибках строк."""
+        numbered = (
+            (number, line)
+            for number, line in enumerate(lines, start=1)
+            if line.strip()
+        )
+        for batch in chunked(numbered, self.batch_size):
+            errors = self.import_batch(batch)
+            yield {
+                'processed': self.processed,
+                'created': self.created,
+                'errors': sorted(errors, key=lambda error: error['line']),
+            }
+
+    def summary(self):
+        return {
+            'done': True,
+            'processed': self.processed,
+            'created': self.created,
+            'failed': self.failed,
+        }
@@ -0,0 +1,44 @@
+from django.db.models import (BigIntegerField, Count, F, IntegerField,
+                              OuterRef, Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from recipes.models import (MAX_TAG_ID, Cart, CustomUser, Favorite, Follow,
+                            Recipe, RecipeTag)
+
+
+def change_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def count_subquery(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0)
+
+
+def tag_mask_subquery():
+    bit = Cast(Value(1), BigIntegerField()).bitleftshift(F('tag_id') - 1)
+    masks = RecipeTag.objects.filter(
+        recipe=OuterRef('pk'), tag_id__lte=MAX_TAG_ID
+    ).order_by().values('recipe').annotate(mask=Sum(bit)).values('mask')
+    return Coalesce(Subquery(masks, output_field=BigIntegerField()), 0)
+
+
+def recalculate_counters(recipes=None, users=None):
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    if users is None:
+        users = CustomUser.objects.all()
+    recipes_updated = recipes.update(
+        favorites_count=count_subquery(Favorite, 'recipe'),
+        cart_count=count_subquery(Cart, 'item'),
+        tag_mask=tag_mask_subquery(),
+    )
+    users_updated = users.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(Follow, 'author'),
+    )
+    return recipes_updated, users_updated
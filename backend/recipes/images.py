@@ -0,0 +1,234 @@
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from PIL import Image, features
+
+from recipes.models import Recipe
+from recipes.storage import is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = 'recipes'
+VARIANT_DIR = 'recipes/variants'
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+GC_BATCH_SIZE = 500
+ALLOWED_FORMATS = {
+    'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+DRAFT_FORMATS = {'JPEG', 'MPO'}
+VARIANTS = {
+    'image_thumbnail': (320, 320),
+    'image_feed': (800, 800),
+}
+VARIANT_FORMAT, VARIANT_EXT = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg'))
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image')
+
+
+def decode_base64_image(data):
+    """Декодирует data URI по частям, не держа в памяти вторую копию."""
+    try:
+        header, encoded = data.split(';base64,', 1)
+    except ValueError:
+        raise ValidationError('Некорректный формат изображения.')
+    if len(encoded) * 3 // 4 > settings.IMAGE_MAX_BYTES:
+        raise ValidationError('Изображение слишком большое.')
+    digest = hashlib.sha256()
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        for start in range(0, len(encoded), CHUNK_SIZE):
+            chunk = base64.b64decode(encoded[start:start + CHUNK_SIZE])
+            digest.update(chunk)
+            file.write(chunk)
+    except (binascii.Error, ValueError):
+        file.close()
+        raise ValidationError('Некорректная кодировка изображения.')
+    file.seek(0)
+    extension = validate_image(file)
+    return File(
+        file, name=f'{IMAGE_DIR}/{digest.hexdigest()}.{extension}')
+
+
+def validate_image(file):
+    """Проверяет формат и размеры по заголовку, не декодируя картинку."""
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является изображением.')
+    finally:
+        file.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError(f'Формат {image_format} не поддерживается.')
+    if max(width, height) > settings.IMAGE_MAX_SIDE:
+        raise ValidationError(
+            f'Сторона изображения больше {settings.IMAGE_MAX_SIDE} px.')
+    return ALLOWED_FORMATS[image_format]
+
+
+def variant_name(image_name, field):
+    digest = image_name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    suffix = field.replace('image_', '')
+    return f'{VARIANT_DIR}/{digest}_{suffix}.{VARIANT_EXT}'
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size)
+    if variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA' if 'A' in variant.mode else 'RGB')
+    if VARIANT_FORMAT == 'JPEG':
+        variant = variant.convert('RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, VARIANT_FORMAT, quality=80)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(recipe_id, image_name):
+    """Строит варианты изображения; нечитаемая картинка их не получает.
+
+    Остальные ошибки (база, хранилище) уходят в future и
+    записываются в лог log_variant_failure.
+    """
+    try:
+        with default_storage.open(image_name) as file, \
+                Image.open(file) as image:
+            # draft декодирует уменьшенную копию, но умеет это только JPEG.
+            if image.format in DRAFT_FORMATS:
+                image.draft('RGB', max(VARIANTS.values()))
+            image.load()
+            names = {}
+            for field, size in VARIANTS.items():
+                name = variant_name(image_name, field)
+                if not default_storage.exists(name):
+                    name = default_storage.save(
+                        name, render_variant(image, size))
+                names[field] = name
+        # update() обходит auto_now: без updated ETag рецепта не сменится.
+        Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            updated=timezone.now(), **names)
+    except (OSError, Image.DecompressionBombError) as error:
+        logger.warning(
+            'Не удалось прочитать изображение %s: %s', image_name, error)
+    finally:
+        connection.close()
+
+
+def log_variant_failure(image_name, future):
+    error = future.exception()
+    if error is not None:
+        logger.error(
+            'Не удалось построить варианты изображения %s', image_name,
+            exc_info=error)
+
+
+def schedule_variants(recipe):
+    if not recipe.image:
+        return
+    image_name = recipe.image.name
+    transaction.on_commit(lambda: executor.submit(
+        build_variants, recipe.pk, image_name
+    ).add_done_callback(partial(log_variant_failure, image_name)))
+
+
+def reference_counts(names):
+    """Сколько рецептов ссылается на каждый из оригиналов names."""
+    return dict(
+        Recipe.objects.filter(image__in=names).order_by().values_list(
+            'image').annotate(total=Count('pk'))
+    )
+
+
+def original_names(variant):
+    digest = variant.rsplit('/', 1)[-1].split('_', 1)[0]
+    return [
+        f'{IMAGE_DIR}/{digest}.{extension}'
+        for extension in set(ALLOWED_FORMATS.values())
+    ]
+
+
+def is_recent(name, grace_period):
+    modified = default_storage.get_modified_time(name).timestamp()
+    return time.time() - modified < grace_period
+
+
+def delete_blob(name):
+    size = default_storage.size(name)
+    default_storage.delete(name)
+    return size
+
+
+def release_images(names):
+    """Удаляет оригиналы без ссылок вместе с их вариантами."""
+    names = [name for name in names if is_content_addressed(name)]
+    if not names:
+        return
+    referenced = reference_counts(names)
+    for name in names:
+        if (name in referenced or not default_storage.exists(name)
+                or is_recent(name, settings.IMAGE_GC_GRACE_PERIOD)):
+            continue
+        delete_blob(name)
+        for field in VARIANTS:
+            variant = variant_name(name, field)
+            if default_storage.exists(variant):
+                delete_blob(variant)
+
+
+def schedule_release(names):
+    transaction.on_commit(lambda: release_images(names))
+
+
+def iter_media_files():
+    for directory in ('', IMAGE_DIR):
+        if default_storage.exists(directory or '.'):
+            for name in default_storage.listdir(directory)[1]:
+                yield f'{directory}/{name}' if directory else name
+
+
+def iter_variant_files():
+    if default_storage.exists(VARIANT_DIR):
+        for name in default_storage.listdir(VARIANT_DIR)[1]:
+            yield f'{VARIANT_DIR}/{name}'
+
+
+def batches(iterable, size=GC_BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def find_orphans(grace_period):
+    """Файлы медиа, на которые не ссылается ни один рецепт."""
+    for names in batches(iter_media_files()):
+        referenced = reference_counts(names)
+        for name in names:
+            if name not in referenced and not is_recent(name, grace_period):
+                yield name
+    for variants in batches(iter_variant_files()):
+        originals = {
+            variant: original_names(variant) for variant in variants}
+        referenced = reference_counts(
+            [name for names in originals.values() for name in names])
+        for variant, names in originals.items():
+            if (not any(name in referenced for name in names)
+                    and not is_recent(variant, grace_period)):
+                yield variant
@@ -0,0 +1,430 @@
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLResolver, resolve, reverse
+from rest_framework.authtoken.models import Token
+
+from api import urls as api_urls
+from foodgram.metrics import QueryRecorder, percentile
+from recipes.bulk import export_recipes
+from recipes.counters import recalculate_counters
+from recipes.models import (Cart, CustomUser, Favorite, Follow, Ingredient,
+                            Recipe, Tag)
+from recipes.seed import (create_recipes, create_users, ensure_ingredients,
+                          ensure_tags, seed_database)
+
+PASSWORD = 'Bench-password-42'
+AUTHORS = 12
+SCALE_LIMITS = (1, 10)
+N_PLUS_ONE = 5
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQMAAAAl21bKAAA'
+    'AA1BMVEUAAACnej3aAAAAAXRSTlMAQObYZgAAAApJREFUCNdjYAAAAAIAAeIhvDMAAAAAS'
+    'UVORK5CYII='
+)
+UNKNOWN_UID = {'uid': 'MA', 'token': 'bench'}
+
+
+def recipe_data(f, name='Бенчмарк'):
+    return {
+        'name': name,
+        'text': 'Рецепт для замера',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': [f['tag'].id],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 100}
+            for ingredient in f['ingredients']
+        ],
+    }
+
+
+# Сценарии: метод, имя маршрута, ожидаемый статус и бюджет запросов.
+# kwargs, query и data могут быть функциями от словаря с фикстурами.
+# scale — повторить с limit из SCALE_LIMITS: число запросов не должно расти.
+CASES = (
+    {'method': 'get', 'route': 'users-list', 'budget': 4, 'scale': True},
+    {'method': 'post', 'route': 'users-list', 'status': 201, 'budget': 8,
+     'anonymous': True,
+     'data': {'email': 'new@foodgram.local', 'username': 'new_bench',
+              'first_name': 'Новый', 'last_name': 'Пользователь',
+              'password': PASSWORD}},
+    {'method': 'get', 'route': 'users-me', 'budget': 2},
+    {'method': 'put', 'route': 'users-me', 'budget': 4,
+     'data': {'email': 'bench@foodgram.local', 'username': 'bench',
+              'first_name': 'Бенч', 'last_name': 'Марк'}},
+    {'method': 'patch', 'route': 'users-me', 'budget': 4,
+     'data': {'first_name': 'Бенчмарк'}},
+    {'method': 'delete', 'route': 'users-me', 'status': 204, 'budget': 80,
+     'data': {'current_password': PASSWORD}},
+    {'method': 'get', 'route': 'users-detail', 'budget': 3,
+     'kwargs': lambda f: {'id': f['author'].id}},
+    {'method': 'put', 'route': 'users-detail', 'budget': 4,
+     'kwargs': lambda f: {'id': f['user'].id},
+     'data': {'email': 'bench@foodgram.local', 'username': 'bench',
+              'first_name': 'Бенч', 'last_name': 'Марк'}},
+    {'method': 'patch', 'route': 'users-detail', 'budget': 4,
+     'kwargs': lambda f: {'id': f['user'].id},
+     'data': {'last_name': 'Бенчмарков'}},
+    {'method': 'delete', 'route': 'users-detail', 'status': 204,
+     'budget': 80, 'kwargs': lambda f: {'id': f['user'].id},
+     'data': {'current_password': PASSWORD}},
+    {'method': 'get', 'route': 'users-subscriptions', 'budget': 4,
+     'scale': True, 'query': {'recipes_limit': 3}},
+    {'method': 'post', 'route': 'users-follow', 'status': 201, 'budget': 10,
+     'kwargs': lambda f: {'id': f['stranger'].id}},
+    {'method': 'delete', 'route': 'users-follow', 'status': 204,
+     'budget': 8, 'kwargs': lambda f: {'id': f['author'].id}},
+    {'method': 'post', 'route': 'users-set-password', 'status': 204,
+     'budget': 3,
+     'data': {'current_password': PASSWORD, 'new_password': PASSWORD}},
+    {'method': 'post', 'route': 'users-set-username', 'status': 204,
+     'budget': 4,
+     'data': {'current_password': PASSWORD,
+              'new_email': 'bench2@foodgram.local'}},
+    {'method': 'post', 'route': 'users-activation', 'status': 400,
+     'budget': 2, 'data': UNKNOWN_UID},
+    {'method': 'post', 'route': 'users-resend-activation', 'status': 400,
+     'budget': 2, 'anonymous': True,
+     'data': {'email': 'nobody@foodgram.local'}},
+    {'method': 'post', 'route': 'users-reset-password', 'status': 204,
+     'budget': 2, 'anonymous': True,
+     'data': {'email': 'nobody@foodgram.local'}},
+    {'method': 'post', 'route': 'users-reset-password-confirm',
+     'status': 400, 'budget': 2, 'anonymous': True,
+     'data': dict(UNKNOWN_UID, new_password=PASSWORD)},
+    {'method': 'post', 'route': 'users-reset-username', 'status': 204,
+     'budget': 2, 'anonymous': True,
+     'data': {'email': 'nobody@foodgram.local'}},
+    {'method': 'post', 'route': 'users-reset-username-confirm',
+     'status': 400, 'budget': 2, 'anonymous': True,
+     'data': dict(UNKNOWN_UID, new_email='nobody@foodgram.local')},
+    {'method': 'get', 'route': 'tags-list', 'budget': 2, 'anonymous': True},
+    {'method': 'get', 'route': 'tags-detail', 'budget': 2,
+     'anonymous': True, 'kwargs': lambda f: {'pk': f['tag'].id}},
+    {'method': 'get', 'route': 'ingredients-list', 'budget': 2,
+     'anonymous': True},
+    {'method': 'get', 'route': 'ingredients-list', 'budget': 1,
+     'anonymous': True, 'query': {'name': 'ингредиент 1'}},
+    {'method': 'post', 'route': 'ingredients-list', 'status': 201,
+     'budget': 4,
+     'data': {'name': 'бенчмарк', 'measurement_unit': 'г'}},
+    {'method': 'get', 'route': 'ingredients-detail', 'budget': 2,
+     'anonymous': True,
+     'kwargs': lambda f: {'pk': f['ingredients'][0].id}},
+    {'method': 'put', 'route': 'ingredients-detail', 'budget': 12,
+     'kwargs': lambda f: {'pk': f['ingredients'][0].id},
+     'data': lambda f: {'name': f['ingredients'][0].name,
+                        'measurement_unit': 'кг'}},
+    {'method': 'patch', 'route': 'ingredients-detail', 'budget': 12,
+     'kwargs': lambda f: {'pk': f['ingredients'][0].id},
+     'data': {'measurement_unit': 'кг'}},
+    {'method': 'delete', 'route': 'ingredients-detail', 'status': 204,
+     'budget': 6, 'kwargs': lambda f: {'pk': f['spare_ingredient'].id}},
+    {'method': 'get', 'route': 'recipes-list', 'budget': 6, 'scale': True},
+    {'method': 'get', 'route': 'recipes-list', 'budget': 5, 'scale': True,
+     'anonymous': True},
+    {'method': 'get', 'route': 'recipes-list', 'budget': 7, 'scale': True,
+     'query': lambda f: {'tags': f['tag'].slug}},
+    {'method': 'get', 'route': 'recipes-list', 'budget': 6, 'scale': True,
+     'query': {'is_favorited': 1}},
+    {'method': 'get', 'route': 'recipes-list', 'budget': 6, 'scale': True,
+     'query': {'is_in_shopping_cart': 1}},
+    {'method': 'get', 'route': 'recipes-list', 'budget': 6, 'scale': True,
+     'query': {'search': 'борщ'}},
+    {'method': 'post', 'route': 'recipes-list', 'status': 201,
+     'budget': 20, 'data': recipe_data},
+    {'method': 'get', 'route': 'recipes-detail', 'budget': 6,
+     'kwargs': lambda f: {'pk': f['recipe'].id}},
+    {'method': 'put', 'route': 'recipes-detail', 'budget': 30,
+     'kwargs': lambda f: {'pk': f['recipe'].id},
+     'data': lambda f: recipe_data(f, 'Бенчмарк обновлённый')},
+    {'method': 'patch', 'route': 'recipes-detail', 'budget': 14,
+     'kwargs': lambda f: {'pk': f['recipe'].id},
+     'data': {'cooking_time': 15}},
+    {'method': 'delete', 'route': 'recipes-detail', 'status': 204,
+     'budget': 16, 'kwargs': lambda f: {'pk': f['recipe'].id}},
+    {'method': 'get', 'route': 'recipes-feed', 'budget': 7, 'scale': True},
+    {'method': 'get', 'route': 'recipes-download-shopping-cart',
+     'budget': 4},
+    {'method': 'get', 'route': 'recipes-export-recipes', 'budget': 5,
+     'query': lambda f: {'author': f['user'].id}},
+    {'method': 'post', 'route': 'recipes-import-recipes', 'budget': 30,
+     'content_type': 'application/x-ndjson',
+     'data': lambda f: f['export']},
+    {'method': 'post', 'route': 'recipes-add-to-shop-cart', 'status': 201,
+     'budget': 8, 'kwargs': lambda f: {'pk': f['stranger_recipe'].id}},
+    {'method': 'delete', 'route': 'recipes-add-to-shop-cart',
+     'status': 204, 'budget': 8,
+     'kwargs': lambda f: {'pk': f['listed_recipe'].id}},
+    {'method': 'post', 'route': 'recipes-favorite', 'status': 201,
+     'budget': 8, 'kwargs': lambda f: {'pk': f['stranger_recipe'].id}},
+    {'method': 'delete', 'route': 'recipes-favorite', 'status': 204,
+     'budget': 8, 'kwargs': lambda f: {'pk': f['listed_recipe'].id}},
+    {'method': 'post', 'route': 'login', 'budget': 3, 'anonymous': True,
+     'data': {'email': 'bench@foodgram.local', 'password': PASSWORD}},
+    {'method': 'post', 'route': 'logout', 'status': 204, 'budget': 3},
+    {'method': 'get', 'route': 'metrics', 'budget': 2},
+    {'method': 'delete', 'route': 'metrics', 'status': 204, 'budget': 2},
+)
+
+
+def resolve_value(value, fixtures):
+    return value(fixtures) if callable(value) else value
+
+
+def case_key(case, query, limit):
+    """Имя замера без id из фикстур, чтобы сравнивать разные запуски."""
+    parts = [case['method'].upper(), case['route'], *sorted(query)]
+    if limit:
+        parts.append(f'limit={limit}')
+    if case.get('anonymous'):
+        parts.append('(аноним)')
+    return ' '.join(parts)
+
+
+def route_handlers(callback):
+    """Метод и обработчик для каждого метода представления."""
+    actions = getattr(callback, 'actions', None)
+    if actions:
+        return {
+            method: (callback.cls, action)
+            for method, action in actions.items() if method != 'head'
+        }
+    return {
+        method: (callback.view_class, method)
+        for method in ('get', 'post', 'put', 'patch', 'delete')
+        if hasattr(callback.view_class, method)
+    }
+
+
+def api_routes(patterns=api_urls.urlpatterns, prefix='api/'):
+    """Обработчики всех адресов api/urls.py и их маршруты.
+
+    Маршрут, перекрытый более ранним с тем же обработчиком, пропускается.
+    """
+    routes = {}
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            for handler, route in api_routes(
+                    pattern.url_patterns,
+                    prefix + str(pattern.pattern)).items():
+                routes.setdefault(handler, route)
+            continue
+        for method, handler in route_handlers(pattern.callback).items():
+            routes.setdefault(handler, (prefix + str(pattern.pattern), method))
+    return routes
+
+
+def create_fixtures():
+    """Данные, на которые опираются сценарии; откатываются после замера."""
+    rng = random.Random(0)
+    tag_ids = ensure_tags()
+    ingredient_ids = ensure_ingredients()
+    user = CustomUser.objects.create_user(
+        email='bench@foodgram.local', username='bench', first_name='Бенч',
+        last_name='Марк', password=PASSWORD, is_staff=True)
+    token = Token.objects.create(user=user)
+    author_ids = create_users(AUTHORS + 1)
+    recipe_ids = create_recipes(3, [user.id], tag_ids, ingredient_ids, rng)
+    recipe_ids += create_recipes(
+        AUTHORS * 3, author_ids, tag_ids, ingredient_ids, rng)
+    stranger_id = author_ids.pop()
+    for author_id in author_ids:
+        Follow.objects.create(user=user, author_id=author_id)
+    for recipe_id in recipe_ids[3:AUTHORS + 3]:
+        Favorite.objects.create(user=user, recipe_id=recipe_id)
+        Cart.objects.create(user=user, item_id=recipe_id)
+    recalculate_counters(
+        Recipe.objects.filter(id__in=recipe_ids),
+        CustomUser.objects.filter(id__in=[user.id, *author_ids, stranger_id]))
+    own_recipes = Recipe.objects.filter(author=user)
+    return {
+        'user': user,
+        'token': token.key,
+        'author': CustomUser.objects.get(id=author_ids[0]),
+        'stranger': CustomUser.objects.get(id=stranger_id),
+        'tag': Tag.objects.get(id=tag_ids[0]),
+        'ingredients': list(
+            Ingredient.objects.filter(id__in=ingredient_ids[:3])),
+        'spare_ingredient': Ingredient.objects.create(
+            name='бенчмарк без рецептов', measurement_unit='г'),
+        'recipe': own_recipes.first(),
+        'stranger_recipe': Recipe.objects.filter(
+            id__in=recipe_ids[AUTHORS + 3:]).first(),
+        'listed_recipe': Recipe.objects.get(id=recipe_ids[3]),
+        'export': ''.join(export_recipes(own_recipes)).encode(),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все маршруты api/urls.py через тестовый клиент, '
+            'замеряет время и число запросов к базе и проверяет бюджеты')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сколько рецептов сгенерировать перед '
+                                 'замером, например 100000')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='benchmark_api.json',
+                            help='Куда записать результаты в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('Нужен хотя бы один повтор')
+        if options['seed']:
+            start = time.monotonic()
+            seed_database(options['seed'], follows_per_user=5,
+                          log=self.stdout.write)
+            self.stdout.write(
+                f'База заполнена за {time.monotonic() - start:.1f} с')
+
+        with override_settings(ALLOWED_HOSTS=['testserver'],
+                               DATABASE_REPLICAS=[]):
+            with transaction.atomic():
+                fixtures = create_fixtures()
+                results, failures = self.run_cases(fixtures, options)
+                transaction.set_rollback(True)
+        failures += self.uncovered_routes(results)
+
+        report = {
+            'meta': {
+                'vendor': connection.vendor,
+                'repeat': options['repeat'],
+                'recipes': Recipe.objects.count(),
+                'users': CustomUser.objects.count(),
+            },
+            'results': results,
+            'failures': failures,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        if options['compare']:
+            self.compare(results, options['compare'])
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f'Проверок не пройдено: {len(failures)}')
+
+    def run_cases(self, fixtures, options):
+        clients = {
+            False: Client(HTTP_AUTHORIZATION=f'Token {fixtures["token"]}'),
+            True: Client(),
+        }
+        routes = api_routes()
+        results, failures = [], []
+        for case in CASES:
+            kwargs = resolve_value(case.get('kwargs', {}), fixtures)
+            path = reverse(case['route'], kwargs=kwargs)
+            query = resolve_value(case.get('query', {}), fixtures)
+            limits = SCALE_LIMITS if case.get('scale') else (None,)
+            counts = []
+            for limit in limits:
+                params = dict(query, limit=limit) if limit else query
+                url = f'{path}?{urlencode(params)}' if params else path
+                result = self.measure(
+                    clients[case.get('anonymous', False)], case, url,
+                    fixtures, options['repeat'])
+                handler = route_handlers(resolve(path).func)[case['method']]
+                result['route'], _ = routes[handler]
+                result['key'] = case_key(case, query, limit)
+                results.append(result)
+                counts.append(result['queries_max'])
+                failures += self.check(case, result)
+            if len(set(counts)) > 1:
+                failures.append(
+                    f'{results[-1]["name"]}: число запросов растёт с '
+                    f'размером страницы {SCALE_LIMITS}: {counts}')
+        return results, failures
+
+    def measure(self, client, case, url, fixtures, repeat):
+        method = case['method']
+        data = resolve_value(case.get('data'), fixtures)
+        content_type = case.get('content_type', 'application/json')
+        if data is not None and content_type == 'application/json':
+            data = json.dumps(data)
+        timings, counts, statuses, suspects = [], [], set(), {}
+        # Первый прогон прогревает кеши и не попадает в статистику.
+        for attempt in range(repeat + 1):
+            recorder = QueryRecorder()
+            with transaction.atomic():
+                with recorder.record():
+                    start = time.perf_counter()
+                    response = client.generic(
+                        method.upper(), url, data or '',
+                        content_type=content_type)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            if attempt:
+                timings.append(elapsed)
+                counts.append(recorder.count)
+                statuses.add(response.status_code)
+                suspects.update(recorder.suspects(N_PLUS_ONE))
+        name = f'{method.upper()} {url}'
+        if case.get('anonymous'):
+            name += ' (аноним)'
+        return {
+            'name': name,
+            'method': method,
+            'route_name': case['route'],
+            'statuses': sorted(statuses),
+            'queries_max': max(counts),
+            'queries_min': min(counts),
+            'budget': case['budget'],
+            'ms_p50': round(percentile(timings, 0.5) * 1000, 2),
+            'ms_p95': round(percentile(timings, 0.95) * 1000, 2),
+            'ms_p99': round(percentile(timings, 0.99) * 1000, 2),
+            'n_plus_one': [
+                {'query': shape, 'repeats': count}
+                for shape, count in suspects.items()
+            ],
+        }
+
+    def check(self, case, result):
+        failures = []
+        expected = case.get('status', 200)
+        if result['statuses'] != [expected]:
+            failures.append(f'{result["name"]}: статус {result["statuses"]}, '
+                            f'ожидался {expected}')
+        if result['queries_max'] > case['budget']:
+            failures.append(f'{result["name"]}: {result["queries_max"]} '
+                            f'запросов при бюджете {case["budget"]}')
+        return failures
+
+    def uncovered_routes(self, results):
+        covered = {
+            (result['route'], result['method']) for result in results
+        }
+        return [
+            f'{method.upper()} {route}: маршрут не покрыт сценарием'
+            for route, method in api_routes().values()
+            if (route, method) not in covered
+        ]
+
+    def compare(self, results, path):
+        with open(path, encoding='utf-8') as file:
+            previous = {
+                result['key']: result
+                for result in json.load(file)['results']
+            }
+        self.stdout.write(self.style.MIGRATE_HEADING('== Сравнение =='))
+        for result in results:
+            old = previous.get(result['key'])
+            if old is None:
+                continue
+            self.stdout.write(
+                f'{result["name"]}: p50 {old["ms_p50"]} → '
+                f'{result["ms_p50"]} мс, запросов {old["queries_max"]} → '
+                f'{result["queries_max"]}')
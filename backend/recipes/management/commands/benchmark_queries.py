@@ -0,0 +1,107 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Cart, CustomUser, Favorite, Recipe, RecipeTag, Tag
+from recipes.seed import seed_database
+
+PAGE_SIZE = 6
+DESIGNED_INDEXES = (
+    (Recipe, 'recipe_created_idx'),
+    (Recipe, 'recipe_author_created_idx'),
+    (RecipeTag, 'tag_recipe_idx'),
+)
+DESIGNED_CONSTRAINTS = (
+    (Favorite, 'user_favorite_unique'),
+    (Cart, 'user_cart_unique'),
+)
+
+
+def get_by_name(items, name):
+    return next(item for item in items if item.name == name)
+
+
+def hot_queries(user, tag, recipe):
+    return {
+        'Лента рецептов': Recipe.objects.all()[:PAGE_SIZE],
+        'Рецепты автора': Recipe.objects.filter(
+            author_id=recipe.author_id)[:PAGE_SIZE],
+        'Фильтр по тегу через JOIN': Recipe.objects.filter(
+            tags__slug__in=[tag.slug])[:PAGE_SIZE],
+        'Фильтр по маске тегов': Recipe.objects.with_any_tag(
+            [tag.id])[:PAGE_SIZE],
+        'Фильтр избранного': Recipe.objects.filter(
+            recipe_favorites__user=user)[:PAGE_SIZE],
+        'Фильтр списка покупок': Recipe.objects.filter(
+            item_cart__user=user)[:PAGE_SIZE],
+        'Лента с флагами пользователя': Recipe.objects.with_user_flags(
+            user)[:PAGE_SIZE],
+        'Проверка избранного': Favorite.objects.filter(
+            user=user, recipe=recipe).order_by()[:1],
+        'Проверка списка покупок': Cart.objects.filter(
+            user=user, item=recipe).order_by()[:1],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы и время горячих запросов ленты и фильтров, '
+            'при необходимости заполняя базу тестовыми рецептами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сколько рецептов сгенерировать перед '
+                                 'замером, например 1000000')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--compare', action='store_true',
+                            help='Сначала замерить без индексов '
+                                 '(только PostgreSQL)')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            start = time.monotonic()
+            seed_database(options['seed'], log=self.stdout.write)
+            self.stdout.write(
+                f'База заполнена за {time.monotonic() - start:.1f} с')
+
+        favorite = Favorite.objects.select_related('user', 'recipe').first()
+        if favorite:
+            user, recipe = favorite.user, favorite.recipe
+        else:
+            user, recipe = CustomUser.objects.first(), Recipe.objects.first()
+        tag = Tag.objects.first()
+        if user is None or recipe is None or tag is None:
+            raise CommandError('В базе нет данных, используйте --seed')
+
+        if options['compare']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--compare поддерживается только для '
+                                   'PostgreSQL')
+            with transaction.atomic():
+                self.drop_designed_indexes()
+                self.run_queries('Без индексов', user, tag, recipe, options)
+                transaction.set_rollback(True)
+        self.run_queries('С индексами', user, tag, recipe, options)
+
+    def drop_designed_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for model, name in DESIGNED_INDEXES:
+                schema_editor.remove_index(
+                    model, get_by_name(model._meta.indexes, name))
+            for model, name in DESIGNED_CONSTRAINTS:
+                schema_editor.remove_constraint(
+                    model, get_by_name(model._meta.constraints, name))
+
+    def run_queries(self, title, user, tag, recipe, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {title} =='))
+        for name, queryset in hot_queries(user, tag, recipe).items():
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: медиана {statistics.median(timings):.2f} мс, '
+                f'максимум {max(timings):.2f} мс'))
+            self.stdout.write(queryset.explain())
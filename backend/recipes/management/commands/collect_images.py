@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.images import delete_blob, find_orphans
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из MEDIA_ROOT изображения, на которые нет ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--grace', type=int,
+                            default=settings.IMAGE_GC_GRACE_PERIOD,
+                            help='Не трогать файлы моложе стольких секунд')
+
+    def handle(self, *args, **options):
+        deleted = freed = 0
+        for name in find_orphans(options['grace']):
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                freed += delete_blob(name)
+            deleted += 1
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {deleted}, освобождено: {freed} байт'))
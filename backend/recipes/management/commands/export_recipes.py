@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.bulk import BATCH_SIZE, export_recipes
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в NDJSON для import_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл .ndjson или - для stdout')
+        parser.add_argument('--author', help='Только рецепты этого автора')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.order_by('id')
+        if options['author']:
+            queryset = queryset.filter(author__email=options['author'])
+        lines = export_recipes(queryset, options['batch_size'])
+        if options['path'] == '-':
+            sys.stdout.writelines(lines)
+            return
+        total = 0
+        with open(options['path'], 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(line)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {total} в {options["path"]}'))
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.bulk import BATCH_SIZE, RecipeImporter
+from recipes.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Импортирует рецепты из NDJSON: по одному рецепту с тегами, '
+            'ингредиентами и путём к изображению на строку')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .ndjson или - для stdin')
+        parser.add_argument('--author',
+                            help='Email автора для всех рецептов вместо '
+                                 'поля author в строках')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = CustomUser.objects.filter(
+                email=options['author']).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден')
+        importer = RecipeImporter(author, options['batch_size'])
+        start = time.monotonic()
+        if options['path'] == '-':
+            self.run(importer, sys.stdin)
+        else:
+            try:
+                with open(options['path'], encoding='utf-8') as file:
+                    self.run(importer, file)
+            except FileNotFoundError:
+                raise CommandError(f'Файл {options["path"]} не найден')
+        summary = importer.summary()
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {summary["processed"]}, '
+            f'создано: {summary["created"]}, '
+            f'с ошибками: {summary["failed"]}, за {elapsed:.2f} с'))
+
+    def run(self, importer, lines):
+        for progress in importer.run(lines):
+            for error in progress['errors']:
+                self.stderr.write(
+                    f'Строка {error["line"]}: {" ".join(error["errors"])}')
+            self.stdout.write(
+                f'Обработано {progress["processed"]}, '
+                f'создано {progress["created"]}')
@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, bump_version
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'data', 'ingredients.csv')
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+
+def read_csv(file, errors):
+    """Пары (название, единица); номера неполных строк пишет в errors."""
+    for number, row in enumerate(csv.reader(file), start=1):
+        if not row:
+            continue
+        if len(row) < 2 or not row[0].strip() or not row[1].strip():
+            errors.append(number)
+            continue
+        yield row[0], row[1]
+
+
+def read_json(file, errors):
+    for number, item in enumerate(json.load(file), start=1):
+        if (not isinstance(item, dict)
+                or not isinstance(item.get('name'), str)
+                or not isinstance(item.get('measurement_unit'), str)):
+            errors.append(number)
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из data/ingredients.csv или .json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+
+        start = time.monotonic()
+        before = Ingredient.objects.count()
+        total = 0
+        errors = []
+        with open(path, encoding='utf-8') as file:
+            rows = reader(file, errors)
+            while True:
+                batch = [
+                    Ingredient(name=name.strip(),
+                               measurement_unit=unit.strip())
+                    for name, unit in islice(rows, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+        created = Ingredient.objects.count() - before
+        if created:
+            bump_version(INGREDIENTS)
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {total}, добавлено: {created}, '
+            f'за {elapsed:.2f} с ({total / max(elapsed, 1e-6):.0f} строк/с)'))
+        if errors:
+            shown = ', '.join(map(str, errors[:MAX_REPORTED_ERRORS]))
+            more = '…' if len(errors) > MAX_REPORTED_ERRORS else ''
+            self.stderr.write(
+                f'Пропущено строк без названия или единицы: {len(errors)} '
+                f'(номера: {shown}{more})')
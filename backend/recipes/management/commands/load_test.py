@@ -0,0 +1,66 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import iri_to_uri
+
+
+def percentile(timings, percent):
+    return statistics.quantiles(timings, n=100)[percent - 1]
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер параллельными GET-запросами, '
+            'чтобы сравнить режимы WSGI и ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+',
+                            help='Например http://localhost:8000/api/recipes/')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--token', help='Токен для заголовка '
+                                            'Authorization')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Нужно хотя бы два запроса')
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers),
+                             timeout=options['timeout']) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as error:
+                status = error.code
+            except (URLError, OSError):
+                status = None
+            return time.perf_counter() - start, status
+
+        urls = islice(
+            cycle(map(iri_to_uri, options['urls'])), options['requests'])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, urls))
+        elapsed = time.perf_counter() - start
+
+        timings = [timing * 1000 for timing, _ in results]
+        errors = sum(
+            1 for _, status in results if status is None or status >= 400)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} запросов за {elapsed:.2f} с, '
+            f'{len(results) / elapsed:.1f} запросов/с, ошибок: {errors}'))
+        self.stdout.write(
+            f'p50 {percentile(timings, 50):.1f} мс, '
+            f'p95 {percentile(timings, 95):.1f} мс, '
+            f'p99 {percentile(timings, 99):.1f} мс, '
+            f'максимум {max(timings):.1f} мс')
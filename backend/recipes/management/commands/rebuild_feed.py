@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает ленты подписок, например после загрузки данных '
+            'в обход API или изменения FEED_FANOUT_LIMIT')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(f'Записей в лентах: {total}'))
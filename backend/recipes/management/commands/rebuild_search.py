@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает полнотекстовый индекс рецептов, например после '
+            'загрузки данных в обход API')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {total}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recalculate_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, покупок, рецептов '
+            'и подписок, а также маски тегов рецептов')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes, users = recalculate_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {recipes}, пользователей: {users}'))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.seed import BATCH_SIZE, ZIPF_EXPONENT, seed_database
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, рецептами, '
+            'избранным, списками покупок и подписками для нагрузочных '
+            'тестов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=None,
+                            help='По умолчанию один на 100 рецептов')
+        parser.add_argument('--favorites', type=int, default=10,
+                            help='Избранных рецептов на пользователя '
+                                 'в среднем')
+        parser.add_argument('--cart', type=int, default=3,
+                            help='Рецептов в списке покупок в среднем')
+        parser.add_argument('--follows', type=int, default=5,
+                            help='Подписок на пользователя в среднем')
+        parser.add_argument('--zipf', type=float, default=ZIPF_EXPONENT,
+                            help='Показатель закона Ципфа для популярности '
+                                 'авторов, рецептов и ингредиентов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        def log(message):
+            self.stdout.write(f'[{time.monotonic() - start:7.1f} с] {message}')
+
+        user_ids, recipe_ids = seed_database(
+            options['recipes'],
+            users=options['users'],
+            favorites_per_user=options['favorites'],
+            cart_per_user=options['cart'],
+            follows_per_user=options['follows'],
+            random_seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=log,
+            exponent=options['zipf'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, рецептов: '
+            f'{len(recipe_ids)} за {time.monotonic() - start:.1f} с'))
@@ -1,8 +1,30 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
 
 MIN_VALUE = 1
 MAX_VALUE = 32000
+MAX_TAG_ID = 63
+
+
+def tag_mask(tag_ids):
+    """Битовая маска тегов: тег с id N занимает бит N - 1."""
+    return sum(
+        1 << (tag_id - 1) for tag_id in set(tag_ids) if tag_id <= MAX_TAG_ID)
+
+
+class CustomUserQuerySet(models.QuerySet):
+    def with_subscription_flag(self, user):
+        if not user.is_authenticated:
+            return self.annotate(is_subscribed=Value(False))
+        return self.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('pk'))))
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
 
 
 class CustomUser(AbstractUser):
@@ -14,6 +36,18 @@ class CustomUser(AbstractUser):
     username = models.CharField(max_length=150, verbose_name='Юзернэйм')
     first_name = models.CharField(max_length=150, verbose_name='Имя')
     last_name = models.CharField(max_length=150, verbose_name='Фамилия')
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    objects = CustomUserManager()
 
     class Meta:
         ordering = ['-email']
@@ -63,11 +97,54 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ['-name']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'measurement_unit'],
+                                    name='ingredient_unit_unique')
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False)
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, item=OuterRef('pk')))
+        )
+
+    def with_any_tag(self, tag_ids):
+        """Рецепты хотя бы с одним из тегов, без JOIN и DISTINCT."""
+        if max(tag_ids) > MAX_TAG_ID:
+            return self.filter(tags__in=tag_ids).distinct()
+        return self.alias(
+            tag_match=F('tag_mask').bitand(tag_mask(tag_ids))
+        ).filter(tag_match__gt=0)
+
+    def for_read(self, user):
+        return self.with_user_flags(user).defer(
+            'search_vector'
+        ).prefetch_related(
+            Prefetch(
+                'author',
+                queryset=CustomUser.objects.with_subscription_flag(user)
+            ),
+            'tags',
+            Prefetch(
+                'recipe_recipeingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')
+            )
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         CustomUser,
@@ -81,6 +158,16 @@ class Recipe(models.Model):
         verbose_name='Название'
     )
     image = models.ImageField(verbose_name='Картинка')
+    image_thumbnail = models.ImageField(
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра'
+    )
+    image_feed = models.ImageField(
+        blank=True,
+        editable=False,
+        verbose_name='Картинка для ленты'
+    )
     text = models.TextField(verbose_name='Описание')
     tags = models.ManyToManyField(
         Tag,
@@ -94,19 +181,44 @@ class Recipe(models.Model):
         through='RecipeIngredient'
     )
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    tag_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тегов'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый индекс'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['-created', '-id'],
+                         name='recipe_created_idx'),
+            models.Index(fields=['author', '-created', '-id'],
+                         name='recipe_author_created_idx'),
+            models.Index(fields=['image'], name='recipe_image_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx')
+        ]
 
     def __str__(self):
         return self.name
 
-    @property
-    def added_to_fav(self):
-        result = Favorite.objects.filter(recipe=self.id)
-        return result.count()
-    # Это же нужно для отображения в админке - кол-во добавлений в избранное
-
 
 class RecipeTag(models.Model):
     recipe = models.ForeignKey(
@@ -127,6 +239,9 @@ class RecipeTag(models.Model):
             models.UniqueConstraint(fields=['recipe', 'tag'],
                                     name='recipe_tag_unique')
         ]
+        indexes = [
+            models.Index(fields=['tag', 'recipe'], name='tag_recipe_idx')
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -167,6 +282,10 @@ class Favorite(models.Model):
 
     class Meta:
         ordering = ['-user']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='user_favorite_unique')
+        ]
 
 
 class Cart(models.Model):
@@ -185,6 +304,10 @@ class Cart(models.Model):
 
     class Meta:
         ordering = ['-user']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'item'],
+                                    name='user_cart_unique')
+        ]
 
 
 class Follow(models.Model):
@@ -203,3 +326,48 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='user_author_unique')
         ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    created = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='timeline_user_recipe_unique')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created', '-recipe'],
+                         name='timeline_user_created_idx')
+        ]
+
+
+class DataVersion(models.Model):
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Таблица'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменено'
+    )
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
@@ -0,0 +1,129 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_search'
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+BATCH_SIZE = 1000
+
+
+def is_postgresql(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def create_search_table(using):
+    """Создаёт таблицу FTS5, которая заменяет tsvector на SQLite."""
+    if connections[using].vendor != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'name, ingredients, text, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def search_vector():
+    names = RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(names), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def ingredient_names(recipe_ids):
+    names = {}
+    for recipe_id, name in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).order_by().values_list(
+                'recipe_id', 'ingredient__name'):
+        names.setdefault(recipe_id, []).append(name)
+    return {recipe_id: ' '.join(items) for recipe_id, items in names.items()}
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковый индекс рецептов по названию, описанию
+    и ингредиентам."""
+    using = router.db_for_write(Recipe)
+    recipes = Recipe.objects.using(using).filter(pk__in=recipe_ids)
+    if is_postgresql(using):
+        return recipes.update(search_vector=search_vector())
+    rows = list(recipes.values_list('pk', 'name', 'text'))
+    if not rows:
+        return 0
+    names = ingredient_names([pk for pk, _, _ in rows])
+    with transaction.atomic(using=using), \
+            connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk, _, _ in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            'VALUES (%s, %s, %s, %s)',
+            [(pk, name, names.get(pk, ''), text) for pk, name, text in rows])
+    return len(rows)
+
+
+def remove_from_search_index(recipe_ids):
+    using = router.db_for_write(Recipe)
+    if is_postgresql(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in recipe_ids])
+
+
+def rebuild_search_index(batch_size=BATCH_SIZE):
+    using = router.db_for_write(Recipe)
+    if is_postgresql(using):
+        return Recipe.objects.using(using).update(
+            search_vector=search_vector())
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    ids = list(Recipe.objects.using(using).values_list('pk', flat=True))
+    return sum(
+        update_search_index(ids[start:start + batch_size])
+        for start in range(0, len(ids), batch_size))
+
+
+def match_expression(query):
+    """Запрос FTS5: все слова по префиксу, вместо стемминга PostgreSQL."""
+    words = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, от самых релевантных."""
+    if is_postgresql(queryset.db):
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-created', '-id')
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    table = Recipe._meta.db_table
+    weights = ', '.join(map(str, FTS_WEIGHTS))
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,)
+    )).annotate(rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+        (match,),
+        output_field=FloatField()
+    )).order_by('-rank', '-created', '-id')
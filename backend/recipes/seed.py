@@ -0,0 +1,197 @@
+import random
+from itertools import accumulate, islice
+
+from django.db import transaction
+
+from recipes.counters import recalculate_counters
+from recipes.models import (Cart, CustomUser, Favorite, Follow, Ingredient,
+                            Recipe, RecipeIngredient, RecipeTag, Tag, tag_mask)
+from recipes.search import update_search_index
+from recipes.timeline import rebuild_timelines
+from recipes.versions import INGREDIENTS, TAGS, bump_version
+
+BATCH_SIZE = 5000
+SEED_IMAGE = 'seed.png'
+ZIPF_EXPONENT = 1.1
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+DISHES = (
+    'Борщ', 'Щи', 'Солянка', 'Плов', 'Омлет', 'Сырники', 'Блины', 'Салат',
+    'Паста', 'Пирог', 'Котлеты', 'Рагу', 'Каша', 'Суп', 'Запеканка',
+)
+STYLES = (
+    'домашний', 'быстрый', 'праздничный', 'постный', 'острый', 'летний',
+    'по-деревенски', 'с травами', 'на сковороде', 'в духовке',
+)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def zipf_sampler(items, rng, exponent=ZIPF_EXPONENT):
+    """Выбор с весами 1 / rank ** exponent: немногие элементы популярны.
+
+    Порядок популярности перемешивается, чтобы не совпадать с id.
+    """
+    items = list(items)
+    rng.shuffle(items)
+    weights = list(accumulate(
+        rank ** -exponent for rank in range(1, len(items) + 1)))
+
+    def sample(count):
+        return rng.choices(items, cum_weights=weights, k=count)
+
+    return sample
+
+
+def ensure_tags():
+    if not Tag.objects.exists():
+        Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in DEFAULT_TAGS
+        )
+        bump_version(TAGS)
+    return list(Tag.objects.values_list('id', flat=True))
+
+
+def ensure_ingredients(count=100):
+    if not Ingredient.objects.exists():
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(count)
+        )
+        bump_version(INGREDIENTS)
+    return list(Ingredient.objects.values_list('id', flat=True))
+
+
+def create_users(count, batch_size=BATCH_SIZE):
+    start = (CustomUser.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0) + 1
+    users = (
+        CustomUser(
+            email=f'seed{number}@foodgram.local',
+            username=f'seed{number}',
+            first_name='Seed',
+            last_name=str(number),
+            password='!'
+        )
+        for number in range(start, start + count)
+    )
+    ids = []
+    for chunk in chunked(users, batch_size):
+        ids.extend(
+            user.id for user in CustomUser.objects.bulk_create(chunk))
+    return ids
+
+
+def create_recipes(count, author_ids, tag_ids, ingredient_ids, rng,
+                   batch_size=BATCH_SIZE, log=None, exponent=ZIPF_EXPONENT):
+    authors = zipf_sampler(author_ids, rng, exponent)
+    ingredients = zipf_sampler(ingredient_ids, rng, exponent)
+    created = 0
+    recipe_ids = []
+    while created < count:
+        size = min(batch_size, count - created)
+        recipe_tags = [
+            rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+            for _ in range(size)
+        ]
+        recipe_authors = authors(size)
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=recipe_authors[number],
+                    name=(f'{rng.choice(DISHES)} {rng.choice(STYLES)} '
+                          f'№{created + number}'),
+                    text=' '.join(rng.choices(DISHES + STYLES, k=12)),
+                    cooking_time=rng.randint(1, 180),
+                    image=SEED_IMAGE,
+                    tag_mask=tag_mask(recipe_tags[number])
+                )
+                for number in range(size)
+            )
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag_id=tag_id)
+                for recipe, tags in zip(recipes, recipe_tags)
+                for tag_id in tags
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient_id in set(ingredients(rng.randint(3, 8)))
+            )
+            update_search_index([recipe.id for recipe in recipes])
+        recipe_ids.extend(recipe.id for recipe in recipes)
+        created += size
+        if log:
+            log(f'Рецептов: {created}/{count}')
+    return recipe_ids
+
+
+def create_user_lists(model, field, user_ids, sample, per_user, rng,
+                      batch_size=BATCH_SIZE):
+    """В среднем per_user связей на пользователя, цели выбирает sample."""
+    rows = (
+        model(user_id=user_id, **{f'{field}_id': target_id})
+        for user_id in user_ids
+        for target_id in set(sample(rng.randint(0, 2 * per_user)))
+        if model is not Follow or target_id != user_id
+    )
+    created = 0
+    for chunk in chunked(rows, batch_size):
+        model.objects.bulk_create(chunk, ignore_conflicts=True)
+        created += len(chunk)
+    return created
+
+
+def seed_database(recipes, users=None, favorites_per_user=10,
+                  cart_per_user=3, follows_per_user=0, random_seed=0,
+                  batch_size=BATCH_SIZE, log=None, exponent=ZIPF_EXPONENT):
+    """Заполняет базу с воспроизводимым при том же random_seed результатом.
+
+    Число рецептов автора, подписчиков автора, популярность рецептов
+    и ингредиентов распределены по закону Ципфа.
+    """
+    rng = random.Random(random_seed)
+    users = users or max(1, recipes // 100)
+    tag_ids = ensure_tags()
+    ingredient_ids = ensure_ingredients()
+    user_ids = create_users(users, batch_size)
+    if log:
+        log(f'Пользователей: {len(user_ids)}')
+    recipe_ids = create_recipes(
+        recipes, user_ids, tag_ids, ingredient_ids, rng, batch_size, log,
+        exponent)
+    popular_recipes = zipf_sampler(recipe_ids, rng, exponent)
+    lists = [
+        ('Избранное', Favorite, 'recipe', popular_recipes,
+         favorites_per_user),
+        ('Списки покупок', Cart, 'item', popular_recipes, cart_per_user),
+        ('Подписки', Follow, 'author', zipf_sampler(user_ids, rng, exponent),
+         follows_per_user),
+    ]
+    for label, model, field, sample, per_user in lists:
+        if per_user:
+            created = create_user_lists(
+                model, field, user_ids, sample, per_user, rng, batch_size)
+            if log:
+                log(f'{label}: {created}')
+    recalculate_counters()
+    if follows_per_user:
+        entries = rebuild_timelines()
+        if log:
+            log(f'Записей в лентах: {entries}')
+    return user_ids, recipe_ids
@@ -0,0 +1,84 @@
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.images import schedule_release
+from recipes.models import (Cart, CustomUser, Favorite, Follow, Ingredient,
+                            Recipe, RecipeIngredient, Tag)
+from recipes.search import (create_search_table, remove_from_search_index,
+                            update_search_index)
+from recipes.timeline import backfill, fan_out, prune, schedule_refill
+from recipes.versions import INGREDIENTS, TAGS, bump_version
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Cart)
+def cart_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.item_id, 'cart_count', 1)
+
+
+@receiver(post_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.item_id, 'cart_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(CustomUser, instance.author_id, 'recipes_count', 1)
+        fan_out([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(CustomUser, instance.author_id, 'recipes_count', -1)
+    schedule_release([instance.image.name])
+    remove_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(CustomUser, instance.author_id, 'followers_count', 1)
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_counter(CustomUser, instance.author_id, 'followers_count', -1)
+    prune(instance.user_id, instance.author_id)
+    schedule_refill(instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version(TAGS)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version(INGREDIENTS)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        update_search_index(RecipeIngredient.objects.filter(
+            ingredient=instance).values('recipe_id'))
+
+
+@receiver(post_migrate)
+def search_table_created(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        create_search_table(using)
@@ -0,0 +1,31 @@
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_NAME = re.compile(
+    r'^recipes/(variants/)?[0-9a-f]{64}(_\w+)?\.\w+$')
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_NAME.match(name or ''))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл с именем-хешем содержимого в одном экземпляре.
+
+    Повторная загрузка тех же байтов возвращает уже сохранённое имя и
+    обновляет время изменения файла, чтобы сборщик мусора не удалил его,
+    пока новая ссылка на него ещё не записана в базу.
+    """
+
+    def save(self, name, content, max_length=None):
+        if is_content_addressed(name) and self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_addressed(name) and not self.exists(name):
+            return name
+        return super().get_available_name(name, max_length)
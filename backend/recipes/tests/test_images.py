@@ -0,0 +1,83 @@
+import io
+import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from recipes.images import build_variants, log_variant_failure
+from recipes.models import CustomUser, Recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BuildVariantsTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=10,
+            image=default_storage.save('recipes/original.png', png()))
+        self.url = f'/api/recipes/{self.recipe.id}/'
+        self.client.force_authenticate(self.author)
+
+    def test_variants_change_etag(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response.data['image_thumbnail'],
+                         response.data['image'])
+
+        build_variants(self.recipe.id, self.recipe.image.name)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('/variants/', response.data['image_thumbnail'])
+        self.assertIn('/variants/', response.data['image_feed'])
+
+    def test_replaced_image_is_not_overwritten(self):
+        old_name = self.recipe.image.name
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image='recipes/new.png')
+        build_variants(self.recipe.id, old_name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_thumbnail, '')
+
+    def test_unreadable_image_is_logged(self):
+        name = default_storage.save(
+            'recipes/broken.png', ContentFile(b'not an image'))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+        with self.assertLogs('recipes.images', 'WARNING'):
+            build_variants(self.recipe.id, name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_thumbnail, '')
+
+    def test_database_errors_are_not_swallowed(self):
+        with mock.patch.object(Recipe.objects, 'filter',
+                               side_effect=DatabaseError('нет связи')):
+            with self.assertRaises(DatabaseError):
+                build_variants(self.recipe.id, self.recipe.image.name)
+
+    def test_failed_future_is_logged(self):
+        future = Future()
+        future.set_exception(DatabaseError('нет связи'))
+        with self.assertLogs('recipes.images', 'ERROR'):
+            log_variant_failure(self.recipe.image.name, future)
@@ -0,0 +1,40 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient
+
+
+class LoadIngredientsTests(TestCase):
+    def load(self, content, suffix='.csv'):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'ingredients{suffix}')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content)
+            stderr = StringIO()
+            call_command('load_ingredients', path, stdout=StringIO(),
+                         stderr=stderr)
+        return stderr.getvalue()
+
+    def test_short_csv_rows_are_reported_and_skipped(self):
+        errors = self.load('соль,г\nперец\n\nсахар,г\n,кг\n')
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', flat=True)),
+            {'соль', 'сахар'})
+        self.assertIn('Пропущено строк без названия или единицы: 2', errors)
+        self.assertIn('номера: 2, 5', errors)
+
+    def test_incomplete_json_items_are_skipped(self):
+        errors = self.load(
+            '[{"name": "соль", "measurement_unit": "г"}, {"name": "перец"}]',
+            suffix='.json')
+        self.assertEqual(Ingredient.objects.get().name, 'соль')
+        self.assertIn('номера: 2', errors)
+
+    def test_reload_is_idempotent(self):
+        self.load('соль,г\n')
+        self.load('соль,г\n')
+        self.assertEqual(Ingredient.objects.count(), 1)
@@ -0,0 +1,50 @@
+from django.test import TestCase, override_settings
+
+from recipes.models import CustomUser, Follow, Recipe
+from recipes.timeline import feed_rows
+
+
+@override_settings(FEED_FANOUT_LIMIT=2)
+class PopularAuthorFeedTests(TestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create(
+            email='author@foodgram.local', username='author')
+        self.readers = [
+            CustomUser.objects.create(
+                email=f'reader{number}@foodgram.local',
+                username=f'reader{number}')
+            for number in range(2)
+        ]
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.author, name=name, text='Текст', cooking_time=10,
+            image='recipe.png')
+
+    def feed(self, user):
+        return [pk for _, pk in feed_rows(user)]
+
+    def test_popular_author_is_merged_on_read(self):
+        recipe = self.create_recipe('Популярный')
+        self.assertEqual(self.feed(self.readers[0]), [recipe.id])
+
+    def test_recipes_stay_after_author_is_no_longer_popular(self):
+        recipe = self.create_recipe('Популярный')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(user=self.readers[1]).delete()
+        self.assertEqual(self.feed(self.readers[0]), [recipe.id])
+        self.assertEqual(self.feed(self.readers[1]), [])
+        later = self.create_recipe('Обычный')
+        self.assertEqual(self.feed(self.readers[0]), [later.id, recipe.id])
+
+    def test_several_unfollows_in_one_transaction(self):
+        recipe = self.create_recipe('Популярный')
+        third = CustomUser.objects.create(
+            email='reader2@foodgram.local', username='reader2')
+        Follow.objects.create(user=third, author=self.author)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Follow.objects.filter(user__in=self.readers[1:] + [third]).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.feed(self.readers[0]), [recipe.id])
@@ -0,0 +1,158 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import CustomUser, Follow, Recipe, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def is_popular(author_id):
+    return CustomUser.objects.filter(
+        pk=author_id, followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(recipes):
+    """Кладёт новые рецепты в ленты подписчиков обычных авторов."""
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe)
+    followers = Follow.objects.filter(
+        author__in=by_author,
+        author__followers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).order_by().values_list('author_id', 'user_id')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe=recipe,
+                          created=recipe.created)
+            for author_id, user_id in followers.iterator()
+            for recipe in by_author[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fill_timelines(author_id, user_ids):
+    """Добавляет подписчикам последние FEED_BACKFILL_SIZE рецептов автора."""
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id).order_by(
+            '-created', '-id').values_list('id', 'created')[
+                :settings.FEED_BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=pk, created=created)
+            for user_id in user_ids
+            for pk, created in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    if not is_popular(author_id):
+        fill_timelines(author_id, [user_id])
+
+
+def refill_author(author_id):
+    """Раскладывает по лентам рецепты автора, переставшего быть популярным.
+
+    Пока автор был популярным, его рецепты подмешивались при чтении и
+    в таймлайны не попадали.
+    """
+    fill_timelines(author_id, list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True)))
+
+
+class Unfollows:
+    """Отписки транзакции, после коммита которой пополняются ленты.
+
+    Автор, переставший быть популярным, определяется одним запросом на
+    транзакцию: подписчиков теперь меньше FEED_FANOUT_LIMIT, а до отписок
+    было не меньше.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        authors = CustomUser.objects.filter(
+            pk__in=list(self.counts),
+            followers_count__lt=settings.FEED_FANOUT_LIMIT
+        ).values_list('pk', 'followers_count')
+        for author_id, followers in authors:
+            if followers + self.counts[author_id] >= (
+                    settings.FEED_FANOUT_LIMIT):
+                refill_author(author_id)
+
+
+def pending_unfollows(connection):
+    for entry in connection.run_on_commit:
+        callback = entry[1]
+        if isinstance(callback, Unfollows) and not callback.done:
+            return callback
+    return None
+
+
+def schedule_refill(author_id):
+    """Пополняет ленты после коммита, если автор перестал быть популярным."""
+    connection = transaction.get_connection()
+    batch = (pending_unfollows(connection)
+             if connection.in_atomic_block else None)
+    if batch is None:
+        batch = Unfollows()
+        batch.counts[author_id] += 1
+        transaction.on_commit(batch)
+    else:
+        batch.counts[author_id] += 1
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def rebuild_timelines():
+    """Собирает все ленты заново по текущим подпискам."""
+    TimelineEntry.objects.all().delete()
+    authors = CustomUser.objects.filter(
+        followers_count__gt=0,
+        followers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', flat=True)
+    for author_id in list(authors):
+        fill_timelines(author_id, list(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True)))
+    return TimelineEntry.objects.count()
+
+
+def feed_rows(user, after=None, limit=None):
+    """Пары (created, recipe_id) ленты подписок по убыванию даты.
+
+    Таймлайн читается одним проходом по индексу timeline_user_created_idx,
+    рецепты популярных авторов подмешиваются при чтении.
+    """
+    sources = [(TimelineEntry.objects.filter(user=user), 'recipe_id')]
+    popular = list(Follow.objects.filter(
+        user=user, author__followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if popular:
+        sources.append((Recipe.objects.filter(author__in=popular), 'id'))
+    rows = set()
+    for queryset, key in sources:
+        if after:
+            created, pk = after
+            queryset = queryset.filter(
+                Q(created__lt=created)
+                | Q(created=created, **{f'{key}__lt': pk}))
+        rows.update(queryset.order_by('-created', f'-{key}').values_list(
+            'created', key)[:limit])
+    return sorted(rows, reverse=True)[:limit]
@@ -0,0 +1,18 @@
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import DataVersion
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+
+
+def bump_version(name):
+    updated = DataVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated=timezone.now())
+    if not updated:
+        DataVersion.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+def get_version(name):
+    return DataVersion.objects.filter(name=name).first()